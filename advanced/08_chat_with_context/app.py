@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 """Chat with Context Script - Context-aware chatbot using Ollama."""
 import ollama
+import contextlib
 
 class ContextualChatbot:
     """Chatbot that maintains context across conversations."""
     
-    def __init__(self, model="llama3", context_doc=""):
+    def __init__(self, model="llama3", context_doc="", scheduler=None, tenant="default"):
         self.model = model
         self.context_doc = context_doc
+        # Optional shared admission control, e.g. a RequestScheduler from
+        # expert/05_async_processing, so chat turns go ahead of bulk jobs
+        self.scheduler = scheduler
+        self.tenant = tenant
         self.messages = []
         if context_doc:
             self.messages.append({'role': 'system', 'content': f"Use this context: {context_doc}"})
@@ -16,12 +21,19 @@ class ContextualChatbot:
         """Send message and get response."""
         self.messages.append({'role': 'user', 'content': user_message})
         try:
-            response = ollama.chat(model=self.model, messages=self.messages)
+            with self._admission():
+                response = ollama.chat(model=self.model, messages=self.messages)
             assistant_msg = response['message']['content']
             self.messages.append({'role': 'assistant', 'content': assistant_msg})
             return assistant_msg
         except Exception as e:
             return f"Error: {str(e)}"
+    
+    def _admission(self):
+        """Slot in the shared scheduler as an interactive request, if any."""
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        return self.scheduler.hold("interactive", self.tenant)
 
 def main():
     print("=== Context-Aware Chatbot Demo ===\n")
@@ -1,29 +1,101 @@
 #!/usr/bin/env python3
 """RAG System Script - Retrieval Augmented Generation with Ollama."""
 import ollama
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from bm25 import BM25Index
+from ingest import chunk_lines
+from packing import pack_context
 
 class SimpleRAG:
     """Simple RAG system using Ollama."""
     
-    def __init__(self, documents, model="llama3"):
-        self.documents = documents
+    def __init__(self, documents=(), model="llama3", chunk_tokens=200, overlap=40,
+                 context_budget=1024, candidates_k=2, dedupe_threshold=0.8,
+                 cache=None, embed_model=None, retriever=None):
         self.model = model
+        self.embed_model = embed_model or model
+        self.cache = cache
+        self.chunk_tokens = chunk_tokens
+        self.overlap = overlap
+        self.context_budget = context_budget
+        self.candidates_k = candidates_k
+        self.dedupe_threshold = dedupe_threshold
+        self.documents = {}
+        self.chunks = {}
+        self.sources = {}
+        self.version = 0
+        self._next_id = 0
+        # Optional replacement for BM25 search, e.g. hybrid.HybridRetriever(rag)
+        self.retriever = retriever
+        # Built once; retrieval only touches documents that share a query term
+        self.index = BM25Index()
+        for doc in documents:
+            self.add_document(doc)
+    
+    def add_document(self, text, source=None, start=0, end=None):
+        """Index one piece of text and return its id."""
+        doc_id = self._next_id
+        self._next_id += 1
+        self.documents[doc_id] = text
+        self.chunks[doc_id] = {'source': source, 'start': start, 'end': start + len(text) if end is None else end}
+        self.index.add(doc_id, text)
+        self.version += 1
+        return doc_id
+    
+    def remove_source(self, source):
+        """Remove every chunk that came from source."""
+        for doc_id in self.sources.pop(source, {}).get('chunk_ids', []):
+            self.index.remove(doc_id)
+            del self.documents[doc_id]
+            del self.chunks[doc_id]
+            self.version += 1
+    
+    def ingest(self, records):
+        """Chunk and index (source, signature, lines) records from ingest.iter_*.
+        
+        Unchanged sources are skipped; a changed source has only its own
+        chunks replaced. Returns counts of added, replaced and skipped sources.
+        """
+        stats = {'added': 0, 'replaced': 0, 'skipped': 0, 'chunks': 0}
+        for source, signature, lines in records:
+            known = self.sources.get(source)
+            if known and known['signature'] == signature:
+                stats['skipped'] += 1
+                continue
+            if known:
+                self.remove_source(source)
+                stats['replaced'] += 1
+            else:
+                stats['added'] += 1
+            chunk_ids = [self.add_document(text, source, start, end)
+                         for start, end, text in chunk_lines(lines, self.chunk_tokens, self.overlap)]
+            self.sources[source] = {'signature': signature, 'chunk_ids': chunk_ids}
+            stats['chunks'] += len(chunk_ids)
+        return stats
+    
+    def search(self, query, top_k):
+        """Return [(score, doc_id)] from the attached retriever or the BM25 index."""
+        if self.retriever is not None:
+            return self.retriever.search(query, top_k)
+        return self.index.search(query, top_k)
     
     def retrieve(self, query, top_k=2):
-        """Simple keyword-based retrieval."""
-        scored = []
-        for doc in self.documents:
-            score = sum(1 for word in query.lower().split() if word in doc.lower())
-            scored.append((score, doc))
-        scored.sort(reverse=True)
-        return [doc for _, doc in scored[:top_k]]
-    
-    def generate(self, query):
-        """Generate answer using retrieved context."""
-        context_docs = self.retrieve(query)
-        context = "\n\n".join(context_docs)
+        """Retrieve the top_k documents (BM25 unless a retriever is attached)."""
+        return [self.documents[doc_id] for _, doc_id in self.search(query, top_k)]
+    
+    def pack(self, query):
+        """Retrieve candidates and pack them into the context token budget."""
+        candidates = [(score, doc_id, self.documents[doc_id])
+                      for score, doc_id in self.search(query, self.candidates_k)]
+        return pack_context(candidates, self.context_budget, self.dedupe_threshold)
+    
+    def build_prompt(self, query, packed):
+        """Build the answer prompt from packed (id, text) chunks."""
+        context = "\n\n".join(text for _, text in packed)
         
-        prompt = f"""Use this context to answer the question:
+        return f"""Use this context to answer the question:
 
 Context:
 {context}
@@ -31,15 +103,167 @@ Context:
 Question: {query}
 
 Answer based on the context:"""
+    
+    def generate(self, query, details=False):
+        """Generate answer using retrieved context.
+        
+        With details=True a dict is returned that also carries the packed
+        context token estimate and Ollama's prompt-eval counters.
+        """
+        prompt, result, cache_key = self._prepare(query)
+        if not result['cached']:
+            self._chat(prompt, result, cache_key)
+        return result if details else result['answer']
+    
+    def generate_many(self, questions, concurrency=4):
+        """Answer many questions; returns detail dicts in input order.
+        
+        All retrievals run first. Questions that packed the same sources are
+        grouped and answered back to back by one worker, so Ollama can reuse
+        the shared context prefix; identical questions are generated once.
+        Groups are split so all `concurrency` workers stay busy, and at most
+        that many generations run at the same time.
+        """
+        start = time.perf_counter()
+        prepared = []
+        groups = {}
+        first_by_prompt = {}
+        duplicates = {}
+        for i, question in enumerate(questions):
+            stage = time.perf_counter()
+            prompt, result, cache_key = self._prepare(question)
+            result['timings'] = {'retrieval_ms': (time.perf_counter() - stage) * 1000}
+            prepared.append((prompt, result, cache_key))
+            if result['cached']:
+                result['timings']['total_ms'] = (time.perf_counter() - start) * 1000
+            elif prompt in first_by_prompt:
+                duplicates[i] = first_by_prompt[prompt]
+            else:
+                first_by_prompt[prompt] = i
+                groups.setdefault(tuple(result['sources']), []).append(i)
+        pending = sum(len(indices) for indices in groups.values())
+        slice_size = max(1, math.ceil(pending / concurrency))
+        work = [indices[i:i + slice_size] for indices in groups.values()
+                for i in range(0, len(indices), slice_size)]
         
+        def run_group(indices):
+            for i in indices:
+                prompt, result, cache_key = prepared[i]
+                stage = time.perf_counter()
+                result['timings']['queue_ms'] = (stage - start) * 1000
+                self._chat(prompt, result, cache_key)
+                done = time.perf_counter()
+                result['timings']['generation_ms'] = (done - stage) * 1000
+                result['timings']['total_ms'] = (done - start) * 1000
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(run_group, work))
+        # Identical questions share the answer of their first occurrence
+        for i, original in duplicates.items():
+            result, answered = prepared[i][1], prepared[original][1]
+            retrieval_ms = result['timings']['retrieval_ms']
+            result.update(answered, timings={**answered['timings'], 'retrieval_ms': retrieval_ms})
+        return [result for _, result, _ in prepared]
+    
+    def _chat(self, prompt, result, cache_key=None):
+        """Run the chat call for prompt and fill result (caching successful answers)."""
         try:
             response = ollama.chat(
                 model=self.model,
                 messages=[{'role': 'user', 'content': prompt}]
             )
-            return response['message']['content']
+            result['answer'] = response['message']['content']
+            result['prompt_eval_count'] = response.get('prompt_eval_count')
+            if response.get('prompt_eval_duration'):
+                result['prompt_eval_ms'] = response['prompt_eval_duration'] / 1e6
+            if cache_key is not None:
+                self.cache.store(*cache_key, result['answer'])
         except Exception as e:
-            return f"Error: {str(e)}"
+            result['answer'] = f"Error: {str(e)}"
+    
+    def generate_stream(self, query):
+        """Yield answer tokens as they arrive.
+        
+        Every event is a dict. Token events carry 'token'; the first one also
+        carries 'sources' and 'context_tokens'. The last event has 'done': True
+        with the full answer, sources, time-to-first-token and tokens/sec, so
+        an empty answer still reports its sources.
+        """
+        start = time.perf_counter()
+        prompt, result, cache_key = self._prepare(query)
+        first = {'sources': result['sources'], 'context_tokens': result['context_tokens']}
+        stats = {'done': True, 'cached': result['cached'], 'ttft_ms': None,
+                 'tokens_per_sec': None, 'eval_count': None, **first}
+        if result['cached']:
+            stats['ttft_ms'] = (time.perf_counter() - start) * 1000
+            yield {'token': result['answer'], **first}
+            yield {**stats, 'answer': result['answer']}
+            return
+        
+        parts = []
+        try:
+            stream = ollama.chat(
+                model=self.model,
+                messages=[{'role': 'user', 'content': prompt}],
+                stream=True
+            )
+            first_token_at = None
+            for chunk in stream:
+                content = chunk['message']['content']
+                if content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        stats['ttft_ms'] = (first_token_at - start) * 1000
+                        yield {'token': content, **first}
+                    else:
+                        yield {'token': content}
+                    parts.append(content)
+                if chunk.get('done'):
+                    stats['eval_count'] = chunk.get('eval_count')
+                    if chunk.get('eval_count') and chunk.get('eval_duration'):
+                        stats['tokens_per_sec'] = chunk['eval_count'] / (chunk['eval_duration'] / 1e9)
+            if stats['tokens_per_sec'] is None and first_token_at is not None:
+                # Server counters missing: fall back to streamed chunks per second
+                elapsed = time.perf_counter() - first_token_at
+                stats['tokens_per_sec'] = len(parts) / elapsed if elapsed else None
+            if cache_key is not None:
+                self.cache.store(*cache_key, "".join(parts))
+        except Exception as e:
+            error = f"Error: {str(e)}"
+            yield {'token': error, **first} if not parts else {'token': error}
+            parts.append(error)
+        yield {**stats, 'answer': "".join(parts)}
+    
+    def _prepare(self, query):
+        """Pack context, build the prompt and consult the cache."""
+        packed, context_tokens = self.pack(query)
+        prompt = self.build_prompt(query, packed)
+        
+        result = {'answer': '', 'sources': [doc_id for doc_id, _ in packed],
+                  'context_tokens': context_tokens, 'prompt_eval_count': None,
+                  'prompt_eval_ms': None, 'cached': False}
+        cache_key = self._cache_lookup(query, packed, result)
+        return prompt, result, cache_key
+    
+    def _cache_lookup(self, query, packed, result):
+        """Fill result from the semantic cache on a hit.
+        
+        Returns the (query embedding, chunk texts) key to store the answer
+        under, or None when there is no cache.
+        """
+        if self.cache is None:
+            return None
+        try:
+            query_embedding = ollama.embed(model=self.embed_model, input=query)['embeddings'][0]
+        except Exception as e:
+            print(f"Cache disabled for this query: {e}")
+            return None
+        chunks = [text for _, text in packed]
+        answer = self.cache.lookup(query_embedding, chunks)
+        if answer is not None:
+            result['answer'] = answer
+            result['cached'] = True
+        return query_embedding, chunks
 
 def main():
     print("=== RAG System Demo ===\n")
@@ -61,10 +285,22 @@ def main():
         "What is Python known for?"
     ]
     
-    for question in questions:
+    for question, result in zip(questions, rag.generate_many(questions, concurrency=2)):
         print(f"Question: {question}")
-        answer = rag.generate(question)
-        print(f"Answer: {answer}\n")
+        print(f"Answer: {result['answer']}")
+        print(f"Context tokens: {result['context_tokens']}, "
+              f"time: {result['timings']['total_ms']:.0f} ms\n")
+    
+    # Streaming answer: tokens are printed as soon as they arrive
+    print(f"Question (streaming): {questions[0]}")
+    print("Answer: ", end='', flush=True)
+    for event in rag.generate_stream(questions[0]):
+        if event.get('done'):
+            ttft = f"{event['ttft_ms']:.0f} ms" if event['ttft_ms'] is not None else "n/a"
+            rate = f"{event['tokens_per_sec']:.1f}" if event['tokens_per_sec'] else "n/a"
+            print(f"\nTime to first token: {ttft}, tokens/sec: {rate}")
+        else:
+            print(event['token'], end='', flush=True)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""BM25 Index - Tokenized inverted index with Okapi BM25 scoring."""
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text):
+    """Lowercase word tokens; 'a' matches the word 'a', not every word containing it."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+class BM25Index:
+    """Inverted index mapping each term to the documents that contain it."""
+    
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.total_length = 0
+    
+    def __len__(self):
+        return len(self.doc_lengths)
+    
+    def add(self, doc_id, text):
+        """Index a document under doc_id (replacing any previous version)."""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self.postings[term][doc_id] = tf
+        self.doc_terms[doc_id] = list(counts)
+        self.doc_lengths[doc_id] = sum(counts.values())
+        self.total_length += self.doc_lengths[doc_id]
+    
+    def remove(self, doc_id):
+        """Drop a document from the index."""
+        for term in self.doc_terms.pop(doc_id, []):
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+    
+    def idf(self, term):
+        """BM25 inverse document frequency (always positive)."""
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self) - df + 0.5) / (df + 0.5))
+    
+    def search(self, query, top_k=2):
+        """Return [(score, doc_id)] for the top_k documents, best first.
+        
+        Only documents sharing at least one query term are scored.
+        """
+        if not self.doc_lengths:
+            return []
+        avg_length = self.total_length / len(self)
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(top_k, ((score, doc_id) for doc_id, score in scores.items()))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Semantic Cache - Reuse answers for paraphrased questions over the same context."""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+import numpy as np
+
+class SemanticCache:
+    """Answer cache keyed by query embedding and retrieved context.
+    
+    A lookup hits when a cached query has cosine similarity >= threshold and
+    was answered from exactly the same context chunks. Chunks are compared by
+    a hash of their text, not by document id, so a saved cache stays correct
+    when the corpus (and with it the id assignment) changes. Entries are
+    evicted least recently used beyond max_entries and expire after ttl
+    seconds.
+    """
+    
+    def __init__(self, threshold=0.92, max_entries=1000, ttl=3600, path=None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._next_key = 0
+        self._matrix = None
+        self._keys = []
+        if path and os.path.exists(path):
+            self.load(path)
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def lookup(self, embedding, chunks):
+        """Return the cached answer for a similar query over the same chunk texts, or None."""
+        self._expire()
+        if self.entries:
+            query = _unit(embedding)
+            if self._matrix is None:
+                self._keys = list(self.entries)
+                self._matrix = np.stack([self.entries[key]['embedding'] for key in self._keys])
+            similarities = self._matrix @ query
+            wanted = context_hashes(chunks)
+            # Best match first; the first entry with the same context wins
+            for row in np.argsort(-similarities):
+                if similarities[row] < self.threshold:
+                    break
+                key = self._keys[row]
+                entry = self.entries[key]
+                if entry['context'] == wanted:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry['answer']
+        self.misses += 1
+        return None
+    
+    def store(self, embedding, chunks, answer):
+        """Cache an answer, evicting the least recently used entry when full."""
+        self.entries[self._next_key] = {'embedding': _unit(embedding), 'context': context_hashes(chunks),
+                                        'answer': answer, 'created': time.time()}
+        self._next_key += 1
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._matrix = None
+    
+    def stats(self):
+        """Hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self),
+                'hit_rate': self.hits / lookups if lookups else 0}
+    
+    def _expire(self):
+        """Drop entries older than ttl."""
+        if not self.ttl:
+            return
+        cutoff = time.time() - self.ttl
+        expired = [key for key, entry in self.entries.items() if entry['created'] < cutoff]
+        for key in expired:
+            del self.entries[key]
+        if expired:
+            self._matrix = None
+    
+    def save(self, path=None):
+        """Persist entries (in LRU order) to a JSON file."""
+        path = path or self.path
+        os.makedirs(os.path.dirname(path) if os.path.dirname(path) else '.', exist_ok=True)
+        entries = [{**entry, 'embedding': entry['embedding'].tolist()} for entry in self.entries.values()]
+        with open(path, 'w') as f:
+            json.dump({'entries': entries}, f)
+    
+    def load(self, path=None):
+        """Load entries saved with save(); expired ones are dropped on next lookup."""
+        with open(path or self.path, 'r') as f:
+            data = json.load(f)
+        self.entries = OrderedDict()
+        self._next_key = 0
+        for entry in data['entries'][-self.max_entries:]:
+            if 'context' not in entry:
+                # Written by a version keyed on document ids, which do not survive restarts
+                continue
+            entry['embedding'] = np.asarray(entry['embedding'], dtype=np.float32)
+            self.entries[self._next_key] = entry
+            self._next_key += 1
+        self._matrix = None
+
+def context_hashes(chunks):
+    """Sorted sha1 digests of the chunk texts; order-independent context identity."""
+    return sorted(hashlib.sha1(text.encode('utf-8')).hexdigest() for text in chunks)
+
+def _unit(vector):
+    """float32 unit vector."""
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
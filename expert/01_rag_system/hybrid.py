@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Hybrid Retrieval - BM25 and dense embeddings fused with reciprocal rank fusion."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import ollama
+from bm25 import tokenize
+
+class DenseIndex:
+    """Pre-normalized float32 embedding matrix over SimpleRAG chunk ids.
+    
+    Same layout as EmbeddingSearch in expert/04_embedding_search: cosine
+    similarity of every chunk is one matrix-vector product.
+    """
+    
+    def __init__(self, model="llama3", batch_size=32):
+        self.model = model
+        self.batch_size = batch_size
+        self.ids = []
+        self.rows = {}
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+    
+    def sync(self, documents):
+        """Embed chunks that are new in documents and drop removed ones."""
+        keep = [doc_id for doc_id in self.ids if doc_id in documents]
+        new = [doc_id for doc_id in documents if doc_id not in self.rows]
+        if len(keep) == len(self.ids) and not new:
+            return
+        parts = [self.matrix[[self.rows[doc_id] for doc_id in keep]]] if keep else []
+        if new:
+            parts.append(self.embed([documents[doc_id] for doc_id in new]))
+        self.ids = keep + new
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self.matrix = np.concatenate(parts) if parts else np.empty((0, 0), dtype=np.float32)
+    
+    def embed(self, texts):
+        """Embed texts in batches through /api/embed and return unit rows."""
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            response = ollama.embed(model=self.model, input=texts[start:start + self.batch_size])
+            vectors.extend(response['embeddings'])
+        return _normalize(np.asarray(vectors, dtype=np.float32))
+    
+    def similarities(self, query_vec, doc_ids):
+        """Cosine similarity of query_vec to specific chunks."""
+        return self.matrix[[self.rows[doc_id] for doc_id in doc_ids]] @ query_vec
+    
+    def search(self, query_vec, top_k):
+        """Return [(score, doc_id)] for the top_k chunks, best first."""
+        if not self.ids:
+            return []
+        scores = self.matrix @ query_vec
+        if top_k < len(scores):
+            rows = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            rows = np.arange(len(scores))
+        rows = rows[np.argsort(-scores[rows])]
+        return [(float(scores[row]), self.ids[row]) for row in rows]
+
+class HybridRetriever:
+    """Runs BM25 and dense retrieval in parallel and fuses them with RRF.
+    
+    Attach with `rag.retriever = HybridRetriever(rag)`. Each search records a
+    per-stage latency breakdown in `last_timings`.
+    """
+    
+    def __init__(self, rag, embed_model=None, candidates_k=20, rrf_k=60,
+                 rerank=False, coverage_weight=0.2):
+        self.rag = rag
+        self.dense = DenseIndex(embed_model or rag.embed_model)
+        self.candidates_k = candidates_k
+        self.rrf_k = rrf_k
+        self.rerank = rerank
+        self.coverage_weight = coverage_weight
+        self.last_timings = {}
+        self._version = None
+        self._pool = ThreadPoolExecutor(max_workers=1)
+    
+    def search(self, query, top_k):
+        """Return [(score, doc_id)] for the top_k fused results, best first.
+        
+        If embedding fails (server down, model missing), the BM25 ranking is
+        returned alone and last_timings records the error under 'dense_error'.
+        """
+        timings = {}
+        start = time.perf_counter()
+        # Lexical search runs on the worker while this thread waits on the embedding
+        lexical_future = self._pool.submit(self._timed, self.rag.index.search, query, self.candidates_k)
+        try:
+            if self._version != self.rag.version:
+                self.dense.sync(self.rag.documents)
+                self._version = self.rag.version
+                timings['sync_ms'] = _ms(start)
+            stage = time.perf_counter()
+            query_vec = _normalize(np.asarray(ollama.embed(model=self.dense.model, input=query)['embeddings'][0],
+                                              dtype=np.float32))
+            timings['embed_ms'] = _ms(stage)
+            stage = time.perf_counter()
+            dense = self.dense.search(query_vec, self.candidates_k)
+            timings['dense_ms'] = _ms(stage)
+        except Exception as e:
+            lexical, timings['lexical_ms'] = lexical_future.result()
+            timings['dense_error'] = str(e)
+            timings['total_ms'] = _ms(start)
+            self.last_timings = timings
+            return lexical[:top_k]
+        lexical, timings['lexical_ms'] = lexical_future.result()
+        
+        stage = time.perf_counter()
+        fused = self.fuse([lexical, dense])
+        timings['fusion_ms'] = _ms(stage)
+        if self.rerank and fused:
+            stage = time.perf_counter()
+            fused = self._rerank(query, query_vec, fused[:self.candidates_k])
+            timings['rerank_ms'] = _ms(stage)
+        timings['total_ms'] = _ms(start)
+        self.last_timings = timings
+        return fused[:top_k]
+    
+    def fuse(self, rankings):
+        """Reciprocal rank fusion: sum of 1 / (rrf_k + rank) over all rankings."""
+        scores = {}
+        for ranking in rankings:
+            for rank, (_, doc_id) in enumerate(ranking, 1):
+                scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (self.rrf_k + rank)
+        return sorted(((score, doc_id) for doc_id, score in scores.items()), reverse=True)
+    
+    def _rerank(self, query, query_vec, candidates):
+        """Cheap re-rank: exact cosine plus the share of query terms each chunk covers."""
+        doc_ids = [doc_id for _, doc_id in candidates]
+        cosine = self.dense.similarities(query_vec, doc_ids)
+        terms = set(tokenize(query))
+        rescored = []
+        for doc_id, similarity in zip(doc_ids, cosine):
+            coverage = len(terms.intersection(tokenize(self.rag.documents[doc_id]))) / len(terms) if terms else 0
+            rescored.append((float(similarity) + self.coverage_weight * coverage, doc_id))
+        rescored.sort(reverse=True)
+        return rescored
+    
+    @staticmethod
+    def _timed(fn, *args):
+        """Call fn and return (result, elapsed ms)."""
+        start = time.perf_counter()
+        return fn(*args), _ms(start)
+
+def _normalize(vectors):
+    """Scale rows to unit length."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def _ms(start):
+    """Milliseconds since start."""
+    return (time.perf_counter() - start) * 1000
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Ingestion Pipeline - Stream files into overlapping, token-bounded chunks."""
+import fnmatch
+import hashlib
+import json
+import os
+import re
+
+WORD_PATTERN = re.compile(r"\S+")
+
+def chunk_lines(lines, chunk_tokens=200, overlap=40):
+    """Yield (start, end, text) chunks from an iterable of text lines.
+    
+    Tokens are whitespace-separated words; each chunk holds at most chunk_tokens
+    of them and shares `overlap` tokens with the previous chunk. Offsets are
+    character positions in the concatenated lines. Only the text of the current
+    window is buffered, never the whole source.
+    """
+    if not 0 <= overlap < chunk_tokens:
+        raise ValueError("overlap must be smaller than chunk_tokens")
+    offset = 0
+    text = ""
+    text_start = 0
+    spans = []
+    # Leading spans of the buffer that an earlier chunk already covered
+    emitted = 0
+    for line in lines:
+        for match in WORD_PATTERN.finditer(line):
+            spans.append((offset + match.start(), offset + match.end()))
+        text += line
+        offset += len(line)
+        while len(spans) >= chunk_tokens:
+            start, end = spans[0][0], spans[chunk_tokens - 1][1]
+            yield start, end, text[start - text_start:end - text_start]
+            spans = spans[chunk_tokens - overlap:]
+            emitted = overlap
+            # Drop buffered text that falls before the next window
+            next_start = spans[0][0] if spans else offset
+            text = text[next_start - text_start:]
+            text_start = next_start
+    if len(spans) > emitted:
+        start, end = spans[0][0], spans[-1][1]
+        yield start, end, text[start - text_start:end - text_start]
+
+def _read_lines(path):
+    """Stream a text file line by line."""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            yield line
+
+def iter_directory(root, patterns=('*.txt', '*.md')):
+    """Yield (source, signature, lines) for matching files below root.
+    
+    The signature (size and mtime) lets the index skip unchanged files.
+    """
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            if not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                continue
+            path = os.path.join(dirpath, name)
+            stat = os.stat(path)
+            yield path, f"{stat.st_size}:{stat.st_mtime_ns}", _read_lines(path)
+
+def iter_jsonl(path, text_field='text', id_field='id'):
+    """Yield (source, signature, lines) for each record of a JSONL file.
+    
+    Records are read one line at a time; the signature is a hash of the text.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            text = record.get(text_field, '')
+            source = f"{path}#{record.get(id_field, line_number)}"
+            signature = hashlib.sha1(text.encode('utf-8')).hexdigest()
+            yield source, signature, text.splitlines(keepends=True)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Context Packing - Fit retrieved chunks into a prompt token budget."""
+import math
+import re
+
+CHARS_PER_TOKEN = 4
+PARTIAL_WORD = re.compile(r"\s*\S*$")
+
+def estimate_tokens(text):
+    """Rough token count: about four characters per token for English text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def shingles(text, size=3):
+    """Set of lowercase word n-grams used for near-duplicate detection."""
+    words = text.lower().split()
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def is_near_duplicate(candidate, kept, threshold):
+    """True if candidate's shingles overlap any kept chunk by Jaccard >= threshold."""
+    for other in kept:
+        union = len(candidate | other)
+        if union and len(candidate & other) / union >= threshold:
+            return True
+    return False
+
+def trim_to_tokens(text, budget):
+    """Cut text at a word boundary so it fits into budget tokens."""
+    limit = max(budget, 0) * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    if not text[limit].isspace():
+        # Drop the word that the limit split in half
+        cut = PARTIAL_WORD.sub('', cut)
+    return cut.rstrip()
+
+def pack_context(chunks, budget, dedupe_threshold=0.8):
+    """Pack (score, id, text) chunks in score order into at most budget tokens.
+    
+    Near-duplicates of an already packed chunk are skipped; the chunk that
+    overflows the budget is trimmed and ends the context. Returns
+    (packed, tokens) where packed is a list of (id, text).
+    """
+    packed = []
+    kept = []
+    tokens = 0
+    for _, chunk_id, text in sorted(chunks, key=lambda chunk: chunk[0], reverse=True):
+        signature = shingles(text)
+        if is_near_duplicate(signature, kept, dedupe_threshold):
+            continue
+        cost = estimate_tokens(text)
+        if tokens + cost > budget:
+            text = trim_to_tokens(text, budget - tokens)
+            if text:
+                packed.append((chunk_id, text))
+                tokens += estimate_tokens(text)
+            break
+        packed.append((chunk_id, text))
+        kept.append(signature)
+        tokens += cost
+    return packed, tokens
@@ -1,62 +1,675 @@
 #!/usr/bin/env python3
 """Multi-Model Ensemble Script - Use multiple models together."""
 import ollama
+import asyncio
+import contextlib
+import inspect
+import math
+import re
+import time
+
+PUNCTUATION = re.compile(r"[^\w\s]")
+SCORE = re.compile(r"\d+(?:\.\d+)?")
+
+CASCADE_SIGNALS = ("self_consistency", "logprobs", "verifier")
+# Just under 2/3, so a 2-of-3 sample majority is accepted
+CASCADE_THRESHOLD = 0.66
+
+# Small model first; escalate when its samples disagree
+DEFAULT_CASCADE = [
+    {'model': "phi3", 'signal': "self_consistency", 'samples': 3, 'threshold': CASCADE_THRESHOLD},
+    {'model': "llama3:70b"},
+]
+
+VERIFIER_PROMPT = """Question: {question}
+Proposed answer: {answer}
+
+How likely is the proposed answer to be correct? Reply with a single number from 0 to 10."""
 
 class ModelEnsemble:
-    """Ensemble of multiple models."""
+    """Ensemble of multiple models.
     
-    def __init__(self, models):
+    Models are queried concurrently through an ollama.AsyncClient, so an
+    ensemble round takes as long as its slowest member, not their sum.
+    """
+    
+    def __init__(self, models, host=None, timeout=None, client=None):
         self.models = models
+        self.host = host
+        # Seconds each model may take before its answer counts as timed out
+        self.timeout = timeout
+        # Any object with an async generate() like ollama.AsyncClient
+        self.client = client
+        self.last_results = {}
+        self.last_batch_stats = {}
+        self.cascade_log = []
     
-    def query_all(self, prompt):
-        """Query all models and return responses."""
-        responses = {}
-        for model in self.models:
+    def query_all(self, prompt, timeout=None, deadline=None, details=False):
+        """Query all models and return responses.
+        
+        With a deadline (seconds), returns whatever arrived by then and
+        cancels the rest. With details=True, each model maps to its result
+        record (answer, status, latency and token counts) instead of text.
+        """
+        results = asyncio.run(self.query_all_async(prompt, timeout, deadline))
+        if details:
+            return results
+        return {model: result['answer'] for model, result in results.items() if result['status'] != 'deadline'}
+    
+    async def query_all_async(self, prompt, timeout=None, deadline=None):
+        """Fan the prompt out to every model; returns {model: result record}.
+        
+        Models still running at the deadline are cancelled and recorded with
+        status 'deadline' and no answer.
+        """
+        async with self._client() as client:
+            return await self._collect(client, prompt, timeout, deadline)
+    
+    async def _collect(self, client, prompt, timeout=None, deadline=None, until=None):
+        """Gather result records until all arrive, the deadline passes, or
+        the async predicate until(model, result) returns True.
+        
+        Models cut off early are recorded with status 'deadline' or
+        'cancelled' and no answer.
+        """
+        results = {}
+        
+        async def collect():
+            arrivals = self._fan_out(client, prompt, timeout)
             try:
-                response = ollama.generate(model=model, prompt=prompt)
-                responses[model] = response['response']
-            except Exception as e:
-                responses[model] = f"Error: {str(e)}"
-        return responses
+                async for model, result in arrivals:
+                    results[model] = result
+                    if until is not None and await until(model, result):
+                        return
+            finally:
+                await arrivals.aclose()
+        
+        started = time.perf_counter()
+        status = 'cancelled'
+        try:
+            await asyncio.wait_for(collect(), deadline)
+        except asyncio.TimeoutError:
+            status = 'deadline'
+        for model in self.models:
+            if model not in results:
+                results[model] = _result(model, None, status, _elapsed_ms(started))
+        self.last_results = results = {model: results[model] for model in self.models}
+        return results
     
-    def consensus_answer(self, question):
-        """Get consensus answer from multiple models."""
-        responses = self.query_all(question)
+    async def _fan_out(self, client, prompt, timeout=None):
+        """Yield (model, result record) as each model finishes.
         
-        # Synthesize responses
-        synthesis_prompt = f"""Question: {question}
-
-Different AI models gave these answers:
-"""
-        for model, answer in responses.items():
-            synthesis_prompt += f"\n{model}: {answer}\n"
+        Closing the generator early (aclose) cancels the models still running.
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        tasks = {asyncio.ensure_future(self._query(client, model, prompt, timeout)): model for model in self.models}
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield tasks[task], task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _query(self, client, model, prompt, timeout, **options):
+        """One model's answer, as a result record that never raises."""
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(client.generate(model=model, prompt=prompt, **options), timeout)
+        except asyncio.TimeoutError:
+            return _result(model, f"Error: timed out after {timeout}s", 'timeout', _elapsed_ms(start))
+        except Exception as e:
+            return _result(model, f"Error: {str(e)}", 'error', _elapsed_ms(start))
+        return _result(model, response['response'], 'ok', _elapsed_ms(start), response)
+    
+    def query_many(self, questions, concurrency=4, keep_alive="5m", unload=True,
+                   timeout=None, load_threshold=0.1):
+        """Ask every model every question, one model at a time.
+        
+        Alternating models per question makes Ollama swap weights in and out
+        when they do not all fit in memory. Here all questions go to one
+        model (up to `concurrency` at once, with `keep_alive` so it stays
+        resident) before the next model starts; with unload=True the finished
+        model is unloaded (keep_alive=0) to make room. Models already loaded
+        go first. Returns [{model: result record}] in question order; reload
+        statistics are kept in last_batch_stats.
+        """
+        return asyncio.run(self.query_many_async(questions, concurrency, keep_alive, unload,
+                                                 timeout, load_threshold))
+    
+    async def query_many_async(self, questions, concurrency=4, keep_alive="5m", unload=True,
+                               timeout=None, load_threshold=0.1):
+        start = time.perf_counter()
+        results = [{} for _ in questions]
+        per_model = {}
+        async with self._client() as client:
+            order = await self._model_order(client)
+            for position, model in enumerate(order):
+                slots = asyncio.Semaphore(concurrency)
+                
+                async def ask(i, question):
+                    async with slots:
+                        results[i][model] = await self._query(client, model, question, timeout,
+                                                              keep_alive=keep_alive)
+                
+                group_start = time.perf_counter()
+                await asyncio.gather(*(ask(i, question) for i, question in enumerate(questions)))
+                load_times = [results[i][model]['load_ms'] for i in range(len(questions))]
+                per_model[model] = {
+                    'loads': sum(load_ms >= load_threshold * 1000 for load_ms in load_times),
+                    'load_ms': sum(load_times),
+                    'elapsed_ms': _elapsed_ms(group_start),
+                }
+                if unload and position < len(order) - 1:
+                    with contextlib.suppress(Exception):
+                        await client.generate(model=model, prompt="", keep_alive=0)
+        self.last_batch_stats = _batch_stats(per_model, len(questions), _elapsed_ms(start))
+        return [{model: result[model] for model in self.models} for result in results]
+    
+    async def _model_order(self, client):
+        """self.models with the ones Ollama already has loaded first."""
+        try:
+            running = await client.ps()
+            loaded = {_with_tag(entry['model']) for entry in running['models']}
+        except Exception:
+            return list(self.models)
+        return sorted(self.models, key=lambda model: _with_tag(model) not in loaded)
+    
+    @contextlib.asynccontextmanager
+    async def _client(self):
+        """The configured client, or an AsyncClient for this event loop."""
+        if self.client is not None:
+            yield self.client
+            return
+        async with ollama.AsyncClient(host=self.host) as client:
+            yield client
+    
+    def consensus_answer(self, question, timeout=None, deadline=None, quorum=None,
+                         match="exact", similarity=0.9, embed_model="nomic-embed-text", details=False):
+        """Get consensus answer from multiple models.
         
-        synthesis_prompt += "\nProvide a consensus answer:"
+        With quorum=k, stops as soon as k models agree: the remaining models
+        are cancelled and their agreed answer is returned without a synthesis
+        call. Answers agree when their normalized text is equal (match="exact")
+        or their embeddings reach `similarity` cosine (match="embedding").
+        Without agreement it falls back to synthesis. details=True returns a
+        report with the answer, the agreeing models and the compute saved.
+        """
+        report = asyncio.run(self.consensus_answer_async(question, timeout, deadline, quorum,
+                                                         match, similarity, embed_model))
+        return report if details else report['answer']
+    
+    async def consensus_answer_async(self, question, timeout=None, deadline=None, quorum=None,
+                                     match="exact", similarity=0.9, embed_model="nomic-embed-text"):
+        if match not in ("exact", "embedding"):
+            raise ValueError(f"Unknown match mode: {match}")
+        async with self._client() as client:
+            groups = []
+            agreed = []
+            
+            async def reached_quorum(model, result):
+                if result['status'] != 'ok':
+                    return False
+                key = await self._answer_key(client, result['answer'], match, embed_model)
+                for group in groups:
+                    if _same_answer(group[0], key, match, similarity):
+                        group[1].append(model)
+                        break
+                else:
+                    group = (key, [model])
+                    groups.append(group)
+                if len(group[1]) >= quorum:
+                    agreed.extend(group[1])
+                    return True
+                return False
+            
+            responses = await self._collect(client, question, timeout, deadline,
+                                            reached_quorum if quorum else None)
+            if agreed:
+                answer = responses[agreed[0]]['answer']
+            else:
+                answer = await self._synthesize(client, question, responses)
+        return _consensus_report(answer, responses, agreed)
+    
+    async def _answer_key(self, client, answer, match, embed_model):
+        """What answers are compared by: normalized text or a unit embedding.
         
+        None when the embedding fails; such an answer matches nothing.
+        """
+        if match == "exact":
+            return normalize_answer(answer)
+        try:
+            response = await client.embed(model=embed_model, input=answer)
+        except Exception:
+            return None
+        vector = response['embeddings'][0]
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+    
+    async def _synthesize(self, client, question, responses):
+        """Ask the first model to merge the successful answers into one."""
+        answers = {model: result['answer'] for model, result in responses.items() if result['status'] == 'ok'}
+        if not answers:
+            return "Error: no model answered"
         try:
-            response = ollama.generate(model=self.models[0], prompt=synthesis_prompt)
+            response = await client.generate(model=self.models[0], prompt=synthesis_prompt(question, answers))
             return response['response']
         except Exception as e:
             return f"Error: {str(e)}"
+    
+    def consensus_stream(self, question, min_answers=2, late="drop", timeout=None):
+        """Yield consensus events while the ensemble is still answering.
+        
+        Synthesis starts as soon as min_answers models have answered and its
+        tokens are streamed. late="drop" cancels the models still running at
+        that point; late="refine" lets them finish and, if any answer arrived
+        late, streams a second pass that revises the draft with them.
+        
+        Events are dicts: {'member': model, 'status', 'latency_ms'} when an
+        answer arrives, {'token', 'pass'} for synthesis tokens (pass 0 draft,
+        1 refinement) and finally {'done': True, 'answer', 'used', 'late',
+        'refined', 'ttft_ms'}.
+        """
+        return _iterate_sync(self.consensus_stream_async(question, min_answers, late, timeout))
+    
+    async def consensus_stream_async(self, question, min_answers=2, late="drop", timeout=None):
+        if late not in ("drop", "refine"):
+            raise ValueError(f"Unknown late-answer mode: {late}")
+        start = time.perf_counter()
+        async with self._client() as client:
+            arrivals = asyncio.Queue()
+            
+            async def drain():
+                results = self._fan_out(client, question, timeout)
+                try:
+                    async for model, result in results:
+                        arrivals.put_nowait((model, result))
+                finally:
+                    await results.aclose()
+                    arrivals.put_nowait(None)
+            
+            members = asyncio.ensure_future(drain())
+            answers = {}
+            finished = False
+            try:
+                # Phase 1: wait for the first min_answers good answers
+                while len(answers) < min_answers:
+                    item = await arrivals.get()
+                    if item is None:
+                        finished = True
+                        break
+                    model, result = item
+                    yield _member_event(result)
+                    if result['status'] == 'ok':
+                        answers[model] = result['answer']
+                if late == "drop" and not finished:
+                    members.cancel()
+                used = list(answers)
+                done = {'done': True, 'used': used, 'late': [], 'refined': False, 'ttft_ms': None}
+                if not answers:
+                    yield {**done, 'answer': "Error: no model answered"}
+                    return
+                
+                # Phase 2: stream the draft synthesis; keep reporting arrivals
+                late_answers = {}
+                draft = []
+                async for event in self._stream_generation(client, synthesis_prompt(question, answers), 0):
+                    if done['ttft_ms'] is None:
+                        done['ttft_ms'] = _elapsed_ms(start)
+                    draft.append(event['token'])
+                    yield event
+                    while late == "refine" and not arrivals.empty():
+                        item = arrivals.get_nowait()
+                        if item is None:
+                            finished = True
+                            continue
+                        yield _member_event(item[1])
+                        if item[1]['status'] == 'ok':
+                            late_answers[item[0]] = item[1]['answer']
+                answer = "".join(draft)
+                
+                # Phase 3: fold answers that arrived after the draft started into a second pass
+                while late == "refine" and not finished:
+                    item = await arrivals.get()
+                    if item is None:
+                        break
+                    yield _member_event(item[1])
+                    if item[1]['status'] == 'ok':
+                        late_answers[item[0]] = item[1]['answer']
+                if late_answers:
+                    refined = []
+                    prompt = refinement_prompt(question, answer, late_answers)
+                    async for event in self._stream_generation(client, prompt, 1):
+                        refined.append(event['token'])
+                        yield event
+                    answer = "".join(refined)
+                    done.update(late=list(late_answers), refined=True)
+                yield {**done, 'answer': answer}
+            finally:
+                members.cancel()
+                await asyncio.gather(members, return_exceptions=True)
+    
+    async def _stream_generation(self, client, prompt, pass_number):
+        """Yield {'token', 'pass'} events from a streamed generate call."""
+        try:
+            async for chunk in await client.generate(model=self.models[0], prompt=prompt, stream=True):
+                if chunk['response']:
+                    yield {'token': chunk['response'], 'pass': pass_number}
+        except Exception as e:
+            yield {'token': f"Error: {str(e)}", 'pass': pass_number}
+    
+    def cascade_answer(self, question, stages=None, details=False):
+        """Answer with the cheapest stage that is confident enough.
+        
+        stages is a list of dicts tried in order, each with a `model`, a
+        confidence `signal` and a `threshold` (default CASCADE_THRESHOLD; the
+        last stage is always accepted). Signals: "self_consistency" samples
+        the model `samples` times and uses the share of agreeing answers
+        (compared as in the quorum mode, but by embedding unless `match` is
+        "exact", since sampled free-form answers rarely agree word for word);
+        "logprobs" uses the mean token probability when the server returns
+        logprobs (the client must accept `logprobs`, ollama-python 0.6.1+;
+        otherwise there is no signal); "verifier" asks `verifier` (default:
+        the stage's model) to rate the answer 0-10. A stage that errors or
+        gives no signal escalates. Outcomes are logged for cascade_stats().
+        """
+        report = asyncio.run(self.cascade_answer_async(question, stages))
+        return report if details else report['answer']
+    
+    async def cascade_answer_async(self, question, stages=None):
+        stages = stages or DEFAULT_CASCADE
+        _check_stages(stages)
+        start = time.perf_counter()
+        trail = []
+        async with self._client() as client:
+            for index, stage in enumerate(stages):
+                stage_start = time.perf_counter()
+                answer, confidence = await self._stage_answer(client, question, stage)
+                trail.append({'model': stage['model'], 'confidence': confidence,
+                              'latency_ms': _elapsed_ms(stage_start), 'answer': answer})
+                threshold = stage.get('threshold', CASCADE_THRESHOLD)
+                if index == len(stages) - 1 or (confidence is not None and confidence >= threshold):
+                    break
+        report = {'answer': trail[-1]['answer'], 'stage': len(trail) - 1, 'model': trail[-1]['model'],
+                  'confidence': trail[-1]['confidence'], 'stages': trail, 'latency_ms': _elapsed_ms(start)}
+        self.cascade_log.append({'models': [stage['model'] for stage in stages], 'stage': report['stage'],
+                                 'latency_ms': report['latency_ms'], 'stage_ms': trail[-1]['latency_ms']})
+        return report
+    
+    async def _stage_answer(self, client, question, stage):
+        """(answer, confidence in [0, 1] or None) from one cascade stage."""
+        model = stage['model']
+        signal = stage.get('signal', 'self_consistency')
+        if signal == 'self_consistency':
+            samples = stage.get('samples', 3)
+            options = {'temperature': stage.get('temperature', 0.7)}
+            results = await asyncio.gather(*(self._query(client, model, question, self.timeout, options=options)
+                                             for _ in range(samples)))
+            answers = [result['answer'] for result in results if result['status'] == 'ok']
+            if not answers:
+                return results[0]['answer'], None
+            match = stage.get('match', 'embedding')
+            groups = []
+            for answer in answers:
+                key = await self._answer_key(client, answer, match, stage.get('embed_model', "nomic-embed-text"))
+                for group in groups:
+                    if _same_answer(group[0], key, match, stage.get('similarity', 0.9)):
+                        group[1].append(answer)
+                        break
+                else:
+                    groups.append((key, [answer]))
+            largest = max(groups, key=lambda group: len(group[1]))[1]
+            return largest[0], len(largest) / samples
+        if signal == 'logprobs':
+            options = {'logprobs': True} if _accepts(client.generate, 'logprobs') else {}
+            try:
+                response = await asyncio.wait_for(client.generate(model=model, prompt=question, **options),
+                                                  self.timeout)
+            except Exception as e:
+                return f"Error: {str(e)}", None
+            logprobs = response.get('logprobs')
+            if not logprobs:
+                return response['response'], None
+            mean = sum(entry['logprob'] for entry in logprobs) / len(logprobs)
+            return response['response'], math.exp(mean)
+        if signal == 'verifier':
+            result = await self._query(client, model, question, self.timeout)
+            if result['status'] != 'ok':
+                return result['answer'], None
+            verdict = await self._query(client, stage.get('verifier', model),
+                                        VERIFIER_PROMPT.format(question=question, answer=result['answer']),
+                                        self.timeout)
+            score = SCORE.search(verdict['answer'] or "") if verdict['status'] == 'ok' else None
+            return result['answer'], min(1.0, float(score.group()) / 10) if score else None
+    
+    def cascade_stats(self):
+        """Share of questions each stage answered and latency saved.
+        
+        The saving compares each question with the mean latency of the last
+        stage, measured on the questions that escalated all the way (None
+        until one has).
+        """
+        if not self.cascade_log:
+            return {'questions': 0, 'stages': [], 'est_latency_saved_ms': None}
+        stages = []
+        for entry in self.cascade_log:
+            for index, model in enumerate(entry['models']):
+                if index == len(stages):
+                    stages.append({'model': model, 'handled': 0, 'latency_ms': 0.0})
+            stage = stages[entry['stage']]
+            stage['handled'] += 1
+            stage['latency_ms'] += entry['latency_ms']
+        questions = len(self.cascade_log)
+        for stage in stages:
+            stage['fraction'] = stage['handled'] / questions
+            stage['mean_latency_ms'] = stage.pop('latency_ms') / stage['handled'] if stage['handled'] else None
+        final = [entry['stage_ms'] for entry in self.cascade_log if entry['stage'] == len(entry['models']) - 1]
+        saved = None
+        if final:
+            baseline = sum(final) / len(final)
+            saved = sum(baseline - entry['latency_ms'] for entry in self.cascade_log)
+        return {'questions': questions, 'stages': stages, 'est_latency_saved_ms': saved}
+
+def synthesis_prompt(question, answers):
+    """Prompt asking for one consensus answer from {model: answer}."""
+    # Synthesize responses
+    prompt = f"""Question: {question}
+
+Different AI models gave these answers:
+"""
+    for model, answer in answers.items():
+        prompt += f"\n{model}: {answer}\n"
+    
+    prompt += "\nProvide a consensus answer:"
+    return prompt
+
+def refinement_prompt(question, draft, late_answers):
+    """Prompt revising a draft consensus with answers that arrived later."""
+    prompt = f"""Question: {question}
+
+Draft consensus answer:
+{draft}
+
+More AI models have answered since:
+"""
+    for model, answer in late_answers.items():
+        prompt += f"\n{model}: {answer}\n"
+    
+    prompt += "\nRevise the draft so it reflects all answers. Provide the final consensus answer:"
+    return prompt
+
+def _member_event(result):
+    return {'member': result['model'], 'status': result['status'], 'latency_ms': result['latency_ms']}
+
+def _iterate_sync(events):
+    """Drive an async generator from synchronous code on a private event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(events.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(events.aclose())
+        loop.close()
+
+def _check_stages(stages):
+    """Reject cascade stages without a model, with an unknown signal or without samples up front."""
+    for stage in stages:
+        if 'model' not in stage:
+            raise ValueError(f"Cascade stage without a model: {stage}")
+        if stage.get('signal', 'self_consistency') not in CASCADE_SIGNALS:
+            raise ValueError(f"Unknown confidence signal: {stage['signal']}")
+        if stage.get('signal', 'self_consistency') == 'self_consistency' and stage.get('samples', 3) < 1:
+            raise ValueError(f"Cascade stage needs at least one sample: {stage}")
+
+def _accepts(method, name):
+    """Whether a client method takes keyword `name` (newer ollama-python releases add some)."""
+    try:
+        parameters = inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        return False
+    return name in parameters or any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters.values())
+
+def normalize_answer(text):
+    """Lowercase, drop punctuation and collapse whitespace for exact matching."""
+    return " ".join(PUNCTUATION.sub(" ", text.lower()).split())
+
+def _same_answer(key, other, match, similarity):
+    if key is None or other is None:
+        return False
+    if match == "exact":
+        return key == other
+    return sum(a * b for a, b in zip(key, other)) >= similarity
+
+def _consensus_report(answer, responses, agreed):
+    """Answer plus the calls a quorum made unnecessary.
+    
+    Tokens saved are estimated from the mean completion length of the
+    answers that did arrive, for each cancelled model and skipped synthesis.
+    """
+    finished = [result for result in responses.values() if result['status'] == 'ok']
+    cancelled = [model for model, result in responses.items() if result['status'] == 'cancelled']
+    calls_saved = len(cancelled) + (1 if agreed else 0)
+    mean_tokens = sum(result['completion_tokens'] for result in finished) / len(finished) if finished else 0
+    return {
+        'answer': answer,
+        'agreed': agreed,
+        'synthesized': not agreed,
+        'responses': responses,
+        'models_cancelled': cancelled,
+        'calls_saved': calls_saved,
+        'est_tokens_saved': round(calls_saved * mean_tokens),
+        'completion_tokens': sum(result['completion_tokens'] for result in finished),
+    }
+
+def _result(model, answer, status, latency_ms, response=None):
+    """Result record for one model: answer text plus latency and token counts."""
+    response = response or {}
+    return {
+        'model': model,
+        'answer': answer,
+        'status': status,
+        'latency_ms': latency_ms,
+        'prompt_tokens': response.get('prompt_eval_count') or 0,
+        'completion_tokens': response.get('eval_count') or 0,
+        'load_ms': (response.get('load_duration') or 0) / 1e6,
+    }
+
+def _batch_stats(per_model, questions, elapsed_ms):
+    """Reloads seen in a grouped batch against interleaved question-by-question order.
+    
+    The interleaved order is not measured: the est_* keys assume only one
+    model fits in memory, so each of the questions x models requests would
+    have loaded its model (a worst case), and price the saving at the mean
+    observed load time.
+    """
+    loads = sum(stats['loads'] for stats in per_model.values())
+    load_ms = sum(stats['load_ms'] for stats in per_model.values())
+    interleaved_loads = questions * len(per_model) if len(per_model) > 1 else min(1, questions)
+    avoided = max(0, interleaved_loads - loads)
+    return {
+        'models': per_model,
+        'loads': loads,
+        'load_ms': load_ms,
+        'est_interleaved_loads': interleaved_loads,
+        'est_reloads_avoided': avoided,
+        'est_load_ms_saved': avoided * (load_ms / loads if loads else 0.0),
+        'elapsed_ms': elapsed_ms,
+    }
+
+def _with_tag(model):
+    return model if ":" in model else model + ":latest"
+
+def _elapsed_ms(start):
+    return (time.perf_counter() - start) * 1000
 
 def main():
     print("=== Multi-Model Ensemble Demo ===\n")
     
     # Use available models (adjust as needed)
     models = ["llama3"]  # Add more: ["llama3", "mistral", "phi3"]
-    ensemble = ModelEnsemble(models)
+    ensemble = ModelEnsemble(models, timeout=120)
     
     question = "What is the capital of France?"
     
     print(f"Question: {question}\n")
     print("Individual Responses:")
-    responses = ensemble.query_all(question)
-    for model, response in responses.items():
-        print(f"{model}: {response}\n")
+    responses = ensemble.query_all(question, details=True)
+    for model, result in responses.items():
+        print(f"{model} ({result['latency_ms']:.0f} ms, {result['completion_tokens']} tokens): {result['answer']}\n")
     
     print("\nConsensus Answer:")
     consensus = ensemble.consensus_answer(question)
     print(consensus)
+    
+    # Majority quorum: stop once most models agree, skipping synthesis
+    print("\nQuorum Answer:")
+    report = ensemble.consensus_answer(question, quorum=len(models) // 2 + 1, details=True)
+    print(report['answer'])
+    print(f"Agreed: {', '.join(report['agreed']) or 'none'}; calls saved: {report['calls_saved']}, "
+          f"~{report['est_tokens_saved']} tokens")
+    
+    # Many questions: each model answers all of them before the next loads
+    print("\nBatch (grouped by model):")
+    questions = ["What is 2 + 2?", "Name a primary color.", "What is H2O?"]
+    for question, answers in zip(questions, ensemble.query_many(questions)):
+        print(f"{question} -> {answers[models[0]]['answer'][:60]}")
+    stats = ensemble.last_batch_stats
+    print(f"Model loads: {stats['loads']} ({stats['load_ms']:.0f} ms), "
+          f"est. reloads avoided vs. interleaved: {stats['est_reloads_avoided']}")
+    
+    # Cascade: small model first, the large one only when the samples disagree.
+    # Samples are compared by embedding (nomic-embed-text); without it every stage escalates
+    print("\nCascade:")
+    stages = [
+        {'model': "phi3", 'signal': "self_consistency", 'samples': 3, 'threshold': CASCADE_THRESHOLD},
+        {'model': models[0]},
+    ]
+    for question in questions:
+        report = ensemble.cascade_answer(question, stages, details=True)
+        confidence = report['confidence']
+        print(f"{question} -> {report['model']} "
+              f"(confidence {confidence if confidence is not None else 'n/a'}): {report['answer'][:60]}")
+    cascade = ensemble.cascade_stats()
+    for stage in cascade['stages']:
+        print(f"{stage['model']}: {stage['fraction']:.0%} of questions")
+    if cascade['est_latency_saved_ms'] is not None:
+        print(f"Latency saved vs. always {models[0]}: {cascade['est_latency_saved_ms']:.0f} ms")
+    
+    # Pipelined: synthesis streams as soon as enough members have answered
+    print("\nStreaming Consensus:")
+    for event in ensemble.consensus_stream(question, min_answers=max(1, len(models) - 1), late="refine"):
+        if 'member' in event:
+            print(f"[{event['member']} answered in {event['latency_ms']:.0f} ms]")
+        elif 'token' in event:
+            print(event['token'], end="", flush=True)
+        else:
+            print(f"\n(first token after {event['ttft_ms'] or 0:.0f} ms, refined: {event['refined']})")
 
 if __name__ == "__main__":
     main()
@@ -1,53 +1,157 @@
 #!/usr/bin/env python3
 """Embedding Search Script - Semantic search using Ollama embeddings."""
 import ollama
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from index import FlatIndex
+from store import EmbeddingStore
 
 class EmbeddingSearch:
     """Semantic search using embeddings."""
     
-    def __init__(self, documents, model="llama3"):
+    def __init__(self, documents, model="llama3", embeddings=None, store_path=None,
+                 batch_size=32, concurrency=4, max_retries=2, index=None):
         self.documents = documents
         self.model = model
-        self.embeddings = self._embed_documents()
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.ingest_stats = {}
+        self.store = None
+        if embeddings is not None:
+            self._build_matrix(embeddings)
+        elif store_path:
+            # Reuse vectors from disk and embed only new or changed documents
+            self.store = EmbeddingStore(store_path, model)
+            self.embeddings, self.doc_ids = self.store.sync(documents, self._embed_normalized)
+        else:
+            self._build_matrix(self._embed_documents())
+        
+        # A pre-populated index (e.g. from index.load_index) is used as-is
+        self.index = index if index is not None else FlatIndex()
+        if not len(self.index):
+            self.index.build(self.embeddings)
     
-    def _embed_documents(self):
-        """Generate embeddings for documents."""
+    def add_documents(self, documents):
+        """Embed new documents and insert them into the index incrementally."""
+        start = len(self.documents)
+        self.documents = self.documents + list(documents)
+        if self.store:
+            vectors, doc_ids = self.store.sync(self.documents, self._embed_normalized)
+            old = len(self.doc_ids)
+            if np.array_equal(doc_ids[:old], self.doc_ids) and np.all(doc_ids[old:] >= start):
+                self.index.add(vectors[old:])
+            else:
+                # Previously failed documents were embedded in between; rebuild
+                self.index.build(vectors)
+            self.doc_ids = doc_ids
+        else:
+            embeddings = self._embed_normalized(documents)
+            keep = [i for i, emb in enumerate(embeddings) if len(emb)]
+            if keep:
+                self.index.add(np.asarray([embeddings[i] for i in keep], dtype=np.float32))
+            self.doc_ids = np.concatenate([self.doc_ids, np.array(keep, dtype=np.int64) + start])
+        self.embeddings = self.index.vectors
+    
+    def _embed_documents(self, documents=None):
+        """Generate embeddings for documents in concurrent batches."""
+        if documents is None:
+            documents = self.documents
+        start = time.perf_counter()
+        embeddings = self._embed_many(documents)
+        elapsed = time.perf_counter() - start
+        self.ingest_stats = {
+            'documents': len(documents),
+            'failed': sum(1 for emb in embeddings if not len(emb)),
+            'seconds': elapsed,
+            'docs_per_sec': len(documents) / elapsed if elapsed else 0,
+            'batch_size': self.batch_size,
+            'concurrency': self.concurrency
+        }
+        return embeddings
+    
+    def _embed_many(self, texts):
+        """Embed texts in batches with at most `concurrency` requests in flight."""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
         embeddings = []
-        for doc in self.documents:
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for batch_embeddings in pool.map(self._embed_batch, batches):
+                embeddings.extend(batch_embeddings)
+        return embeddings
+    
+    def _embed_batch(self, batch):
+        """Embed a batch with one /api/embed call, falling back to single documents."""
+        try:
+            response = ollama.embed(model=self.model, input=batch)
+            if len(response['embeddings']) == len(batch):
+                return response['embeddings']
+        except Exception:
+            pass
+        return [self._embed_one(doc) for doc in batch]
+    
+    def _embed_one(self, doc):
+        """Embed a single document, retrying with exponential backoff."""
+        for attempt in range(self.max_retries + 1):
             try:
-                emb = ollama.embeddings(model=self.model, prompt=doc)
-                embeddings.append(emb['embedding'])
+                return ollama.embed(model=self.model, input=doc)['embeddings'][0]
             except Exception as e:
-                print(f"Error embedding document: {e}")
-                print(f"Note: Embeddings may not be supported by all models.")
-                embeddings.append([])
-        return embeddings
+                if attempt == self.max_retries:
+                    print(f"Error embedding document: {e}")
+                    print(f"Note: Embeddings may not be supported by all models.")
+                    return []
+                time.sleep(0.5 * 2 ** attempt)
+    
+    def _embed_normalized(self, documents):
+        """Embed documents and return unit-length float32 vectors ([] on failure)."""
+        return [self._normalize(emb) if len(emb) else emb for emb in self._embed_documents(documents)]
+    
+    def _build_matrix(self, embeddings):
+        """Pack embeddings into a contiguous, pre-normalized float32 matrix."""
+        # Documents that failed to embed get no row; doc_ids maps rows back
+        self.doc_ids = np.array([i for i, emb in enumerate(embeddings) if len(emb)], dtype=np.int64)
+        if len(self.doc_ids):
+            matrix = np.asarray([embeddings[i] for i in self.doc_ids], dtype=np.float32)
+        else:
+            matrix = np.empty((0, 0), dtype=np.float32)
+        self.embeddings = self._normalize(matrix)
+    
+    @staticmethod
+    def _normalize(vectors):
+        """Scale rows to unit length so a dot product equals cosine similarity."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
     
     def search(self, query, top_k=3):
         """Search for similar documents."""
         try:
-            query_emb = ollama.embeddings(model=self.model, prompt=query)
-            query_vec = query_emb['embedding']
+            query_emb = ollama.embed(model=self.model, input=query)
+            query_vec = self._normalize(query_emb['embeddings'][0])
             
-            # Cosine similarity
-            similarities = []
-            for i, doc_emb in enumerate(self.embeddings):
-                if doc_emb:
-                    similarity = self._cosine_similarity(query_vec, doc_emb)
-                    similarities.append((similarity, i))
-            
-            similarities.sort(reverse=True)
-            results = [self.documents[i] for _, i in similarities[:top_k]]
-            return results
+            # Cosine similarity via the index (exact matrix-vector product by default)
+            rows, _ = self.index.search(query_vec, top_k)
+            return [self.documents[i] for i in self.doc_ids[rows]]
         except Exception as e:
             return [f"Error: {str(e)}"]
     
-    def _cosine_similarity(self, vec1, vec2):
-        """Calculate cosine similarity."""
-        dot = sum(a*b for a, b in zip(vec1, vec2))
-        mag1 = sum(a*a for a in vec1) ** 0.5
-        mag2 = sum(b*b for b in vec2) ** 0.5
-        return dot / (mag1 * mag2) if mag1 and mag2 else 0
+    def search_many(self, queries, top_k=3):
+        """Search several queries at once; results follow the input order."""
+        try:
+            embeddings = self._embed_many(list(queries))
+            results = [["Error: query could not be embedded"] for _ in embeddings]
+            embedded = [i for i, emb in enumerate(embeddings) if len(emb)]
+            if not embedded:
+                return results
+            
+            # Unit query matrix scored against the corpus in memory-bounded blocks
+            query_matrix = self._normalize(np.asarray([embeddings[i] for i in embedded], dtype=np.float32))
+            for i, (rows, _) in zip(embedded, self.index.search_many(query_matrix, top_k)):
+                results[i] = [self.documents[j] for j in self.doc_ids[rows]]
+            return results
+        except Exception as e:
+            return [[f"Error: {str(e)}"] for _ in queries]
 
 def main():
     print("=== Embedding Search Demo ===\n")
@@ -61,15 +165,18 @@ def main():
     ]
     
     search = EmbeddingSearch(documents)
+    stats = search.ingest_stats
+    print(f"Embedded {stats['documents']} documents in {stats['seconds']:.2f}s "
+          f"({stats['docs_per_sec']:.1f} docs/s, batch_size={stats['batch_size']}, "
+          f"concurrency={stats['concurrency']})\n")
     
     queries = [
         "programming languages",
         "pet animals"
     ]
     
-    for query in queries:
+    for query, results in zip(queries, search.search_many(queries, top_k=2)):
         print(f"Query: {query}")
-        results = search.search(query, top_k=2)
         print("Top results:")
         for i, result in enumerate(results, 1):
             print(f"  {i}. {result}")
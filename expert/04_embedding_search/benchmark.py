@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Embedding Search Benchmark - Compare search strategies on synthetic vectors."""
+import time
+import numpy as np
+from app import EmbeddingSearch
+from index import FlatIndex, IVFFlatIndex, QuantizedIndex
+
+NUM_DOCS = 10000
+DIM = 1024
+TOP_K = 5
+QUERIES = 5
+
+ANN_DOCS = 100000
+ANN_DIM = 256
+ANN_CLUSTERS = 500
+ANN_QUERIES = 200
+RECALL_K = 10
+NPROBES = [1, 4, 16, 64]
+RERANKS = [1, 4, 10]
+BATCH_QUERIES = 1000
+
+def loop_search(embeddings, query_vec, top_k):
+    """Reference implementation: pure-Python cosine similarity per document."""
+    similarities = []
+    for i, doc_emb in enumerate(embeddings):
+        dot = sum(a*b for a, b in zip(query_vec, doc_emb))
+        mag1 = sum(a*a for a in query_vec) ** 0.5
+        mag2 = sum(b*b for b in doc_emb) ** 0.5
+        similarities.append((dot / (mag1 * mag2) if mag1 and mag2 else 0, i))
+    similarities.sort(reverse=True)
+    return [i for _, i in similarities[:top_k]]
+
+def vector_search(search, query_vec, top_k):
+    """Vectorized search without the embedding round trip."""
+    rows, _ = search.index.search(search._normalize(query_vec), top_k)
+    return list(search.doc_ids[rows])
+
+def timed(fn, *args):
+    """Return (result, seconds) for a single call."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def clustered_vectors(rng, count, dim, clusters):
+    """Unit vectors grouped around random centres, like real embedding corpora."""
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(clusters, size=count)]
+    vectors += 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return EmbeddingSearch._normalize(vectors)
+
+def benchmark_exact(rng):
+    """Python loop versus one NumPy matrix-vector product."""
+    print(f"-- Exact search: {NUM_DOCS} documents, {DIM} dimensions, top_k={TOP_K} --")
+    vectors = rng.standard_normal((NUM_DOCS, DIM)).astype(np.float32)
+    queries = rng.standard_normal((QUERIES, DIM)).astype(np.float32)
+    
+    documents = [f"doc {i}" for i in range(NUM_DOCS)]
+    lists = vectors.tolist()
+    search = EmbeddingSearch(documents, embeddings=lists)
+    
+    loop_time = 0.0
+    vector_time = 0.0
+    for query in queries:
+        expected, seconds = timed(loop_search, lists, query.tolist(), TOP_K)
+        loop_time += seconds
+        got, seconds = timed(vector_search, search, query, TOP_K)
+        vector_time += seconds
+        assert expected == got, (expected, got)
+    
+    print(f"Python loop:  {loop_time / QUERIES * 1000:.1f} ms/query")
+    print(f"NumPy matvec: {vector_time / QUERIES * 1000:.2f} ms/query")
+    print(f"Speedup: {loop_time / vector_time:.0f}x\n")
+
+def recall_at_k(truth, found):
+    """Mean fraction of the exact top-k present in each approximate result."""
+    return np.mean([len(truth[i].intersection(rows)) / RECALL_K for i, rows in enumerate(found)])
+
+def ann_dataset(rng):
+    """Clustered corpus, perturbed queries and their exact top-k."""
+    vectors = clustered_vectors(rng, ANN_DOCS, ANN_DIM, ANN_CLUSTERS)
+    queries = vectors[rng.choice(ANN_DOCS, ANN_QUERIES, replace=False)]
+    queries = EmbeddingSearch._normalize(queries + 0.05 * rng.standard_normal(queries.shape))
+    
+    exact = FlatIndex()
+    exact.build(vectors)
+    start = time.perf_counter()
+    truth = [set(exact.search(q, RECALL_K)[0]) for q in queries]
+    exact_ms = (time.perf_counter() - start) / ANN_QUERIES * 1000
+    print(f"Exact:          {exact_ms:.2f} ms/query, recall 1.000")
+    return vectors, queries, truth, exact_ms
+
+def benchmark_ivf(vectors, queries, truth):
+    """Recall@k and latency of IVFFlatIndex against exact search."""
+    ivf = IVFFlatIndex()
+    _, build_time = timed(ivf.build, vectors)
+    print(f"IVF build:      {build_time:.1f}s ({len(ivf.centroids)} cells)")
+    for nprobe in NPROBES:
+        start = time.perf_counter()
+        found = [ivf.search(q, RECALL_K, nprobe=nprobe)[0] for q in queries]
+        ivf_ms = (time.perf_counter() - start) / ANN_QUERIES * 1000
+        print(f"IVF nprobe={nprobe:<3} {ivf_ms:.2f} ms/query, recall {recall_at_k(truth, found):.3f}")
+
+def benchmark_quantized(vectors, queries, truth, exact_ms):
+    """Memory per vector, recall@k and latency against exact search of int8 and binary codes."""
+    print(f"\nMemory per {ANN_DIM}-dim vector:")
+    print(f"  Python float list: {ANN_DIM * 32} bytes (8-byte pointer + 24-byte float object)")
+    print(f"  float32 row:       {ANN_DIM * 4} bytes")
+    for mode in ('int8', 'binary'):
+        index = QuantizedIndex(mode)
+        index.build(vectors)
+        print(f"  {mode + ' codes:':<19}{index.bytes_per_vector()} bytes")
+        for rerank in RERANKS:
+            start = time.perf_counter()
+            found = [index.search(q, RECALL_K, rerank=rerank)[0] for q in queries]
+            ms = (time.perf_counter() - start) / ANN_QUERIES * 1000
+            print(f"    rerank x{rerank:<3} {ms:.2f} ms/query ({ms / exact_ms:.2f}x exact), "
+                  f"recall {recall_at_k(truth, found):.3f}")
+
+def benchmark_batch(vectors, rng):
+    """One matvec per query versus blocked matrix-matrix products."""
+    print(f"\n-- Batch search: {BATCH_QUERIES} queries --")
+    queries = EmbeddingSearch._normalize(rng.standard_normal((BATCH_QUERIES, ANN_DIM)))
+    index = FlatIndex()
+    index.build(vectors)
+    single, single_time = timed(lambda: [index.search(q, RECALL_K)[0] for q in queries])
+    batched, batch_time = timed(index.search_many, queries, RECALL_K)
+    assert all(np.array_equal(a, b) for a, (b, _) in zip(single, batched))
+    print(f"search():      {single_time / BATCH_QUERIES * 1000:.2f} ms/query")
+    print(f"search_many(): {batch_time / BATCH_QUERIES * 1000:.2f} ms/query")
+    print(f"Speedup: {single_time / batch_time:.1f}x")
+
+def main():
+    print("=== Embedding Search Benchmark ===\n")
+    rng = np.random.default_rng(0)
+    benchmark_exact(rng)
+    print(f"-- Approximate search recall@{RECALL_K}: {ANN_DOCS} documents, {ANN_DIM} dimensions --")
+    vectors, queries, truth, exact_ms = ann_dataset(rng)
+    benchmark_ivf(vectors, queries, truth)
+    benchmark_quantized(vectors, queries, truth, exact_ms)
+    benchmark_batch(vectors, rng)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""Vector Index - Exact and approximate nearest-neighbour backends for EmbeddingSearch."""
+import json
+import os
+import numpy as np
+
+def top_k_indices(scores, top_k):
+    """Return indices of the top_k scores, best first."""
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if top_k >= len(scores):
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates])]
+
+def top_k_per_row(scores, top_k):
+    """Return indices of the top_k scores in every row, best first."""
+    if top_k >= scores.shape[1]:
+        return np.argsort(-scores, axis=1)
+    candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+class FlatIndex:
+    """Exact search: score every vector with one matrix-vector product."""
+    
+    def __init__(self):
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+    
+    def __len__(self):
+        return len(self.vectors)
+    
+    def build(self, vectors):
+        """Index vectors (kept by reference, so memory-mapped input stays mapped)."""
+        self.vectors = vectors
+    
+    def add(self, vectors):
+        """Append vectors; their rows continue after the existing ones."""
+        self.vectors = _append_rows(self.vectors, vectors)
+    
+    def search(self, query, top_k):
+        """Return (rows, scores) of the best top_k vectors for a unit query."""
+        if not len(self.vectors):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self.vectors @ query
+        rows = top_k_indices(scores, top_k)
+        return rows, scores[rows]
+    
+    def search_many(self, queries, top_k, max_scores=1 << 24):
+        """Return (rows, scores) per unit query, scoring blocks of queries with one matmul.
+        
+        Each block holds at most max_scores similarities (64 MB of float32).
+        """
+        if not len(self.vectors) or top_k <= 0:
+            return [self.search(query, top_k) for query in queries]
+        block = max(1, max_scores // len(self.vectors))
+        results = []
+        for start in range(0, len(queries), block):
+            scores = queries[start:start + block] @ self.vectors.T
+            rows = top_k_per_row(scores, top_k)
+            results.extend(zip(rows, np.take_along_axis(scores, rows, axis=1)))
+        return results
+    
+    def save(self, path):
+        """Save the index to a directory."""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'vectors.npy'), self.vectors)
+        with open(os.path.join(path, 'index.json'), 'w') as f:
+            json.dump({'type': 'flat'}, f)
+    
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load an index saved with save()."""
+        index = cls()
+        index.vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r' if mmap else None)
+        return index
+
+class IVFFlatIndex:
+    """Inverted-file index: k-means cells, exact scoring inside the probed cells.
+    
+    nlist controls the number of cells (default about 4*sqrt(n)); nprobe is the
+    recall/latency knob - more probed cells means higher recall and slower queries.
+    """
+    
+    def __init__(self, nlist=None, nprobe=8, train_iters=10, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iters = train_iters
+        self.seed = seed
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.centroids = None
+        self.lists = []
+    
+    def __len__(self):
+        return len(self.vectors)
+    
+    def build(self, vectors):
+        """Train cells on vectors and assign every row to its nearest cell."""
+        self.vectors = vectors
+        self.centroids = None
+        self.lists = []
+        if len(vectors):
+            self._train(vectors)
+            self._assign(np.arange(len(vectors)))
+    
+    def add(self, vectors):
+        """Insert vectors incrementally; cells are trained on the first insert."""
+        start = len(self.vectors)
+        self.vectors = _append_rows(self.vectors, vectors)
+        if self.centroids is None:
+            self._train(self.vectors)
+            start = 0
+        self._assign(np.arange(start, len(self.vectors)))
+    
+    def search(self, query, top_k, nprobe=None):
+        """Return (rows, scores) of the best top_k vectors in the nprobe nearest cells."""
+        if self.centroids is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        cells = top_k_indices(self.centroids @ query, nprobe)
+        # Sorted row order keeps reads from a memory-mapped matrix sequential
+        candidates = np.sort(np.concatenate([self.lists[c] for c in cells]))
+        scores = self.vectors[candidates] @ query
+        best = top_k_indices(scores, top_k)
+        return candidates[best], scores[best]
+    
+    def search_many(self, queries, top_k):
+        """Return (rows, scores) for each unit query."""
+        return [self.search(query, top_k) for query in queries]
+    
+    def _train(self, vectors):
+        """Spherical k-means on a sample of vectors."""
+        rng = np.random.default_rng(self.seed)
+        nlist = self.nlist or max(1, int(4 * np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        sample_size = min(len(vectors), max(nlist * 32, 10000))
+        sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.train_iters):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            counts = np.bincount(labels, minlength=nlist)
+            order = np.argsort(labels, kind='stable')
+            filled = np.nonzero(counts)[0]
+            starts = np.searchsorted(labels[order], filled)
+            sums = np.zeros_like(centroids)
+            sums[filled] = np.add.reduceat(sample[order], starts, axis=0)
+            # Re-seed empty cells so every centroid stays useful
+            empty = counts == 0
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+        self.centroids = centroids
+        self.lists = [np.empty(0, dtype=np.int64) for _ in range(nlist)]
+    
+    def _assign(self, rows, chunk=65536):
+        """Append rows to the inverted list of their nearest centroid."""
+        labels = np.empty(len(rows), dtype=np.int64)
+        for start in range(0, len(rows), chunk):
+            block = np.asarray(self.vectors[rows[start:start + chunk]])
+            labels[start:start + chunk] = np.argmax(block @ self.centroids.T, axis=1)
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(len(self.centroids) + 1))
+        for cell in range(len(self.centroids)):
+            members = rows[order[bounds[cell]:bounds[cell + 1]]]
+            if len(members):
+                self.lists[cell] = np.concatenate([self.lists[cell], members])
+    
+    def save(self, path):
+        """Save vectors, centroids and inverted lists to a directory."""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'vectors.npy'), self.vectors)
+        lists = self.lists or [np.empty(0, dtype=np.int64)]
+        np.savez(os.path.join(path, 'ivf.npz'),
+                 centroids=self.centroids if self.centroids is not None else np.empty((0, 0)),
+                 ids=np.concatenate(lists),
+                 offsets=np.cumsum([0] + [len(ids) for ids in lists]))
+        with open(os.path.join(path, 'index.json'), 'w') as f:
+            json.dump({'type': 'ivf_flat', 'nlist': self.nlist, 'nprobe': self.nprobe,
+                       'train_iters': self.train_iters, 'seed': self.seed}, f)
+    
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load an index saved with save()."""
+        with open(os.path.join(path, 'index.json'), 'r') as f:
+            params = json.load(f)
+        index = cls(params['nlist'], params['nprobe'], params['train_iters'], params['seed'])
+        index.vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r' if mmap else None)
+        data = np.load(os.path.join(path, 'ivf.npz'))
+        if data['centroids'].size:
+            index.centroids = data['centroids'].astype(np.float32)
+            offsets = data['offsets']
+            index.lists = [data['ids'][offsets[i]:offsets[i + 1]] for i in range(len(index.centroids))]
+        return index
+
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def popcount(codes):
+    """Per-byte set-bit counts (native np.bitwise_count on NumPy 2, lookup table otherwise)."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(codes)
+    return POPCOUNT[codes]
+
+class QuantizedIndex:
+    """Compressed first pass over int8 or 1-bit codes, then exact float re-ranking.
+    
+    mode='int8' stores one byte per dimension (scaled by the largest magnitude
+    seen per dimension); mode='binary' stores one sign bit per dimension and
+    ranks by Hamming distance. The top top_k*rerank candidates are re-scored
+    against the float vectors, which can stay memory-mapped on disk. int8
+    saves memory only: its scan is no faster than FlatIndex.
+    """
+    
+    def __init__(self, mode='int8', rerank=10, chunk=16384):
+        if mode not in ('int8', 'binary'):
+            raise ValueError(f"Unknown quantization mode: {mode}")
+        self.mode = mode
+        self.rerank = rerank
+        self.chunk = chunk
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.codes = None
+        self.scale = None
+    
+    def __len__(self):
+        return len(self.vectors)
+    
+    def bytes_per_vector(self):
+        """RAM used per vector by the first-pass codes."""
+        return self.codes.shape[1] if self.codes is not None else 0
+    
+    def build(self, vectors):
+        """Quantize vectors; the float originals are kept by reference for re-ranking."""
+        self.vectors = vectors
+        self.scale = None
+        self.codes = self._encode(vectors) if len(vectors) else None
+    
+    def add(self, vectors):
+        """Quantize and append vectors."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = self._encode(vectors)
+        self.codes = codes if self.codes is None else np.concatenate([self.codes, codes])
+        self.vectors = _append_rows(self.vectors, vectors)
+    
+    def search(self, query, top_k, rerank=None):
+        """Return (rows, scores) after a quantized scan and exact re-ranking."""
+        if self.codes is None or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        coarse = self._coarse_scores(query)
+        candidates = np.sort(top_k_indices(coarse, top_k * (rerank or self.rerank)))
+        scores = self.vectors[candidates] @ query
+        best = top_k_indices(scores, top_k)
+        return candidates[best], scores[best]
+    
+    def search_many(self, queries, top_k):
+        """Return (rows, scores) for each unit query."""
+        return [self.search(query, top_k) for query in queries]
+    
+    def _encode(self, vectors):
+        """Quantize vectors in chunks so the float input never has to be copied whole."""
+        if self.mode == 'int8' and self.scale is None:
+            # Unit vectors: per-dimension scale from the largest magnitude in the first batch
+            sample = np.asarray(vectors[:self.chunk])
+            peak = np.abs(sample).max(axis=0)
+            peak[peak == 0] = 1.0
+            self.scale = (127.0 / peak).astype(np.float32)
+        blocks = []
+        for start in range(0, len(vectors), self.chunk):
+            block = np.asarray(vectors[start:start + self.chunk], dtype=np.float32)
+            if self.mode == 'int8':
+                blocks.append(np.clip(np.rint(block * self.scale), -127, 127).astype(np.int8))
+            else:
+                blocks.append(np.packbits(block > 0, axis=1))
+        return np.concatenate(blocks)
+    
+    def _coarse_scores(self, query):
+        """Approximate similarity of every code to the query (higher is better)."""
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        if self.mode == 'int8':
+            scaled_query = (query / self.scale).astype(np.float32)
+        else:
+            query_bits = np.packbits(query > 0)
+        for start in range(0, len(self.codes), self.chunk):
+            block = self.codes[start:start + self.chunk]
+            if self.mode == 'int8':
+                # NumPy has no int8 BLAS product; the upcast block costs about a float32 scan
+                scores[start:start + len(block)] = block.astype(np.float32) @ scaled_query
+            else:
+                distance = popcount(np.bitwise_xor(block, query_bits)).sum(axis=1, dtype=np.int32)
+                scores[start:start + len(block)] = -distance
+        return scores
+    
+    def save(self, path):
+        """Save float vectors, codes and scale to a directory."""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'vectors.npy'), self.vectors)
+        if self.codes is not None:
+            np.save(os.path.join(path, 'codes.npy'), self.codes)
+        if self.scale is not None:
+            np.save(os.path.join(path, 'scale.npy'), self.scale)
+        with open(os.path.join(path, 'index.json'), 'w') as f:
+            json.dump({'type': 'quantized', 'mode': self.mode, 'rerank': self.rerank,
+                       'chunk': self.chunk}, f)
+    
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load an index saved with save(); codes are read into RAM."""
+        with open(os.path.join(path, 'index.json'), 'r') as f:
+            params = json.load(f)
+        index = cls(params['mode'], params['rerank'], params['chunk'])
+        index.vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r' if mmap else None)
+        if os.path.exists(os.path.join(path, 'codes.npy')):
+            index.codes = np.load(os.path.join(path, 'codes.npy'))
+        if os.path.exists(os.path.join(path, 'scale.npy')):
+            index.scale = np.load(os.path.join(path, 'scale.npy'))
+        return index
+
+INDEX_TYPES = {'flat': FlatIndex, 'ivf_flat': IVFFlatIndex, 'quantized': QuantizedIndex}
+
+def load_index(path, mmap=True):
+    """Load any index saved with save(), dispatching on its stored type."""
+    with open(os.path.join(path, 'index.json'), 'r') as f:
+        kind = json.load(f)['type']
+    return INDEX_TYPES[kind].load(path, mmap=mmap)
+
+def _append_rows(vectors, new_vectors):
+    """Stack new rows under existing ones (copies memory-mapped input into RAM)."""
+    new_vectors = np.asarray(new_vectors, dtype=np.float32)
+    if not len(vectors):
+        return np.ascontiguousarray(new_vectors)
+    return np.concatenate([vectors, new_vectors])
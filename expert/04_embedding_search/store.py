@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Embedding Store - Persist document embeddings as a memory-mapped .npy file."""
+import hashlib
+import json
+import os
+import re
+import numpy as np
+
+COPY_CHUNK_ROWS = 4096
+
+class EmbeddingStore:
+    """On-disk embedding cache keyed by model name and content hash.
+    
+    Each model gets a `<model>.npy` matrix (one float32 row per document, in
+    document order) and a `<model>.json` manifest listing the content hash of
+    every row. Unchanged corpora are memory-mapped without re-embedding.
+    """
+    
+    def __init__(self, directory, model):
+        self.directory = directory
+        self.model = model
+        name = re.sub(r'[^A-Za-z0-9._-]', '_', model)
+        self.vectors_path = os.path.join(directory, f"{name}.npy")
+        self.manifest_path = os.path.join(directory, f"{name}.json")
+    
+    @staticmethod
+    def content_hash(text):
+        """Hash document text to a stable manifest key."""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    def load(self):
+        """Return (hashes, vectors) with vectors memory-mapped read-only."""
+        if not (os.path.exists(self.manifest_path) and os.path.exists(self.vectors_path)):
+            return [], None
+        with open(self.manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('model') != self.model:
+            return [], None
+        vectors = np.load(self.vectors_path, mmap_mode='r')
+        if len(vectors) != len(manifest['hashes']):
+            return [], None
+        return manifest['hashes'], vectors
+    
+    def sync(self, documents, embed_fn):
+        """Return (vectors, doc_ids) for documents, embedding only new or changed ones.
+        
+        embed_fn takes a list of texts and returns one vector per text; an
+        empty vector marks a failure and leaves that document without a row.
+        """
+        hashes = [self.content_hash(doc) for doc in documents]
+        stored_hashes, vectors = self.load()
+        row_of = {h: row for row, h in enumerate(stored_hashes)}
+        
+        pending = {}
+        for doc, h in zip(documents, hashes):
+            if h not in row_of:
+                pending.setdefault(h, doc)
+        new_vectors = {}
+        if pending:
+            for h, emb in zip(pending, embed_fn(list(pending.values()))):
+                if len(emb):
+                    new_vectors[h] = np.asarray(emb, dtype=np.float32)
+        
+        doc_ids = [i for i, h in enumerate(hashes) if h in row_of or h in new_vectors]
+        ordered = [hashes[i] for i in doc_ids]
+        doc_ids = np.array(doc_ids, dtype=np.int64)
+        if ordered == stored_hashes:
+            if vectors is None:
+                vectors = np.empty((0, 0), dtype=np.float32)
+            return vectors, doc_ids
+        
+        self._write(ordered, vectors, row_of, new_vectors)
+        del vectors
+        return self.load()[1], doc_ids
+    
+    def _write(self, ordered, vectors, row_of, new_vectors):
+        """Write rows for ordered hashes to a new file, then swap it in atomically."""
+        os.makedirs(self.directory, exist_ok=True)
+        if vectors is not None and len(vectors):
+            dim = vectors.shape[1]
+        else:
+            dim = len(next(iter(new_vectors.values())))
+        
+        tmp_vectors = self.vectors_path + '.tmp'
+        out = np.lib.format.open_memmap(tmp_vectors, mode='w+', dtype=np.float32,
+                                        shape=(len(ordered), dim))
+        # Copy surviving rows in chunks so large stores never load fully into RAM
+        kept = [(dst, row_of[h]) for dst, h in enumerate(ordered) if h not in new_vectors]
+        for start in range(0, len(kept), COPY_CHUNK_ROWS):
+            dst, src = zip(*kept[start:start + COPY_CHUNK_ROWS])
+            out[list(dst)] = vectors[list(src)]
+        for dst, h in enumerate(ordered):
+            if h in new_vectors:
+                out[dst] = new_vectors[h]
+        out.flush()
+        del out
+        
+        tmp_manifest = self.manifest_path + '.tmp'
+        with open(tmp_manifest, 'w') as f:
+            json.dump({'model': self.model, 'dim': dim, 'hashes': ordered}, f)
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_manifest, self.manifest_path)
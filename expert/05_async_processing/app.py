@@ -2,26 +2,163 @@
 """Async Processing Script - Concurrent processing with Ollama."""
 import ollama
 import asyncio
+import itertools
+import weakref
+import httpx
+from limiter import AdaptiveLimiter
 
-async def async_generate(prompt, model="llama3"):
-    """Asynchronously generate response."""
+MAX_CONNECTIONS = 32
+# Connections per httpx pool; larger caps are spread over several pools
+POOL_SIZE = 32
+
+# One AsyncClient (and so one connection pool) per event loop, host and pool size
+_async_clients = weakref.WeakKeyDictionary()
+_connection_slots = weakref.WeakKeyDictionary()
+
+def get_async_client(host=None, max_connections=MAX_CONNECTIONS):
+    """Return the AsyncClient shared by all requests on the running event loop.
+    
+    An httpx pool's bookkeeping grows with its connection count, so above
+    POOL_SIZE connections the client is a ShardedAsyncClient over several pools.
+    """
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if (host, max_connections) not in clients:
+        shards = [_pooled_client(host, size) for size in _pool_sizes(max_connections)]
+        clients[host, max_connections] = shards[0] if len(shards) == 1 else ShardedAsyncClient(shards)
+    return clients[host, max_connections]
+
+class ShardedAsyncClient:
+    """AsyncClient facade spreading calls round-robin over several clients."""
+    
+    def __init__(self, clients):
+        self.clients = clients
+        self._next = itertools.cycle(clients)
+    
+    def __getattr__(self, name):
+        return getattr(next(self._next), name)
+
+def _pooled_client(host, size):
+    limits = httpx.Limits(max_connections=size, max_keepalive_connections=size)
+    return ollama.AsyncClient(host=host, limits=limits)
+
+def _pool_sizes(max_connections):
+    """Split max_connections into near-equal pools of at most POOL_SIZE."""
+    count = -(-max_connections // POOL_SIZE)
+    return [max_connections // count + (1 if i < max_connections % count else 0) for i in range(count)]
+
+def connection_slots(max_connections=MAX_CONNECTIONS):
+    """Semaphore admitting at most max_connections requests into the pool at once.
+    
+    httpx scans every queued request on each pool event, so thousands of
+    waiting requests make the pool itself the bottleneck; they wait here instead.
+    """
+    slots = _connection_slots.setdefault(asyncio.get_running_loop(), {})
+    if max_connections not in slots:
+        slots[max_connections] = asyncio.Semaphore(max_connections)
+    return slots[max_connections]
+
+async def async_generate(prompt, model="llama3", client=None, use_threads=False, limiter=None,
+                         max_connections=MAX_CONNECTIONS):
+    """Asynchronously generate response.
+    
+    Uses the shared ollama.AsyncClient unless use_threads is set, which runs
+    the blocking ollama.generate in the default thread pool instead. With a
+    limiter the request waits for one of its slots and reports its latency.
+    At most max_connections requests are in flight on the shared client;
+    raise it to run more at once against a server that can take them.
+    """
     try:
-        # Use run_in_executor for compatibility with ollama library
+        if limiter is None:
+            async with connection_slots(max_connections):
+                return await _generate(prompt, model, client, use_threads, max_connections)
+        async with limiter.slot(), connection_slots(max_connections):
+            return await _generate(prompt, model, client, use_threads, max_connections)
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+async def _generate(prompt, model, client, use_threads, max_connections=MAX_CONNECTIONS):
+    """Single generate call on the shared client or the thread pool."""
+    if use_threads:
         loop = asyncio.get_running_loop()
         response = await loop.run_in_executor(
             None,
             lambda: ollama.generate(model=model, prompt=prompt)
         )
-        return response['response']
-    except Exception as e:
-        return f"Error: {str(e)}"
+    else:
+        response = await (client or get_async_client(max_connections=max_connections)).generate(
+            model=model, prompt=prompt)
+    return response['response']
 
-async def process_batch(prompts, model="llama3"):
-    """Process multiple prompts concurrently."""
-    tasks = [async_generate(prompt, model) for prompt in prompts]
+async def process_batch(prompts, model="llama3", client=None, use_threads=False, limiter=None,
+                        max_connections=MAX_CONNECTIONS):
+    """Process multiple prompts concurrently.
+    
+    In-flight requests are capped by an AdaptiveLimiter (a fresh one unless
+    given), so a large batch does not flood a server that runs few in parallel,
+    and by max_connections, the size of the shared client's connection pool.
+    """
+    limiter = limiter or AdaptiveLimiter(max_limit=max_connections)
+    tasks = [async_generate(prompt, model, client, use_threads, limiter, max_connections) for prompt in prompts]
     results = await asyncio.gather(*tasks)
     return results
 
+async def stream_batch(prompts, model="llama3", mode="as_completed", window=64,
+                       client=None, use_threads=False, limiter=None, max_connections=MAX_CONNECTIONS):
+    """Yield (index, prompt, result) while a batch is still running.
+    
+    prompts may be a list, any iterable or an async iterator; it is consumed
+    lazily. mode="as_completed" yields each result as soon as it finishes;
+    mode="ordered" yields in input order. Either way at most `window` prompts
+    are started but not yet yielded, so memory stays bounded for endless input.
+    """
+    if mode not in ("as_completed", "ordered"):
+        raise ValueError(f"Unknown mode: {mode}")
+    limiter = limiter or AdaptiveLimiter(max_limit=max_connections)
+    source = _aiter(prompts)
+    pending = {}
+    finished = {}
+    next_index = 0
+    started = 0
+    exhausted = False
+    try:
+        while True:
+            # Reorder buffer plus running tasks never exceed the window
+            while not exhausted and len(pending) + len(finished) < window:
+                try:
+                    prompt = await source.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                task = asyncio.ensure_future(async_generate(prompt, model, client, use_threads, limiter,
+                                                            max_connections))
+                pending[task] = (started, prompt)
+                started += 1
+            if not pending:
+                break
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index, prompt = pending.pop(task)
+                if mode == "as_completed":
+                    yield index, prompt, task.result()
+                else:
+                    finished[index] = (prompt, task.result())
+            while next_index in finished:
+                prompt, result = finished.pop(next_index)
+                yield next_index, prompt, result
+                next_index += 1
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def _aiter(items):
+    """Iterate a sync or async iterable asynchronously."""
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
 def main():
     print("=== Async Processing Demo ===\n")
     
@@ -46,13 +183,25 @@ def main():
     # Async processing
     print("Async Processing:")
     start = time.time()
-    results = asyncio.run(process_batch(prompts))
+    limiter = AdaptiveLimiter(max_limit=MAX_CONNECTIONS)
+    results = asyncio.run(process_batch(prompts, limiter=limiter))
     for prompt, result in zip(prompts, results):
         print(f"Prompt: {prompt}")
         print(f"Response: {result[:50]}...\n")
     async_time = time.time() - start
     print(f"Time: {async_time:.2f}s")
     print(f"Speedup: {seq_time/async_time:.2f}x")
+    metrics = limiter.metrics()
+    print(f"Concurrency limit: {metrics['limit']} (error rate {metrics['error_rate']:.0%})")
+    
+    # Streaming results: printed as each prompt finishes
+    print("\nStreaming Results (as completed):")
+    
+    async def show_results():
+        async for index, prompt, result in stream_batch(prompts, mode="as_completed"):
+            print(f"[{index}] {prompt}: {result[:50]}...")
+    
+    asyncio.run(show_results())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Load Balancer - Client-side balancing across several Ollama servers."""
+import asyncio
+import collections
+import hashlib
+import threading
+import time
+import ollama
+from app import get_async_client
+
+POLICIES = ("least_outstanding", "model_affinity")
+
+class Endpoint:
+    """One Ollama server with its load, health and latency record."""
+    
+    def __init__(self, host, window=256):
+        self.host = host
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.latencies = collections.deque(maxlen=window)
+        self._client = None
+    
+    def available(self, now):
+        return now >= self.ejected_until
+    
+    def sync_client(self):
+        if self._client is None:
+            self._client = ollama.Client(host=self.host)
+        return self._client
+    
+    def percentile(self, q):
+        """Latency percentile in seconds over the recent window, None before any success."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    
+    def stats(self, now):
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'in_flight': self.in_flight,
+            'ejected': not self.available(now),
+            'ejections': self.ejections,
+            'p50_ms': p50 * 1000 if p50 is not None else None,
+            'p95_ms': p95 * 1000 if p95 is not None else None,
+        }
+
+class LoadBalancer:
+    """Spreads generate/chat calls over several Ollama hosts.
+    
+    policy="least_outstanding" sends each request to the healthy endpoint
+    with the fewest requests in flight (ties go to the lower median latency).
+    policy="model_affinity" sends a model to its own endpoint, chosen by
+    rendezvous hashing so each model stays loaded on one box, and spills to
+    the least loaded endpoint once that one has affinity_limit in flight.
+    
+    Health checks are passive: eject_after consecutive connection errors or
+    5xx answers eject an endpoint for eject_seconds, doubling on each repeat.
+    After that it gets traffic again, and one more failure ejects it anew.
+    
+    The async generate/chat match ollama.AsyncClient, so a balancer can be
+    passed as `client` to process_batch; sync_client() serves blocking code.
+    """
+    
+    def __init__(self, hosts, policy="least_outstanding", affinity_limit=8,
+                 eject_after=3, eject_seconds=10.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {policy}")
+        if not hosts:
+            raise ValueError("At least one host is required")
+        self.endpoints = [Endpoint(host) for host in hosts]
+        self.policy = policy
+        self.affinity_limit = affinity_limit
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self._lock = threading.Lock()
+    
+    def pick(self, model, exclude=()):
+        """Choose an endpoint for a request to `model` and count it as in flight.
+        
+        Endpoints in `exclude` are only used when nothing else is left.
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude] or self.endpoints
+            healthy = [endpoint for endpoint in candidates if endpoint.available(now)]
+            if not healthy:
+                # Everything is ejected: try the one that comes back first
+                healthy = [min(candidates, key=lambda endpoint: endpoint.ejected_until)]
+            endpoint = None
+            if self.policy == "model_affinity":
+                preferred = max(self.endpoints, key=lambda endpoint: _rendezvous(model, endpoint.host))
+                if preferred in healthy and preferred.in_flight < self.affinity_limit:
+                    endpoint = preferred
+            if endpoint is None:
+                endpoint = min(healthy, key=_load)
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+            return endpoint
+    
+    def release(self, endpoint, latency=None, error=None):
+        """Record how a request picked from `endpoint` ended (no latency: cancelled)."""
+        with self._lock:
+            endpoint.in_flight -= 1
+            if latency is None and error is None:
+                return
+            if error is None:
+                endpoint.consecutive_failures = 0
+                endpoint.latencies.append(latency)
+                return
+            endpoint.errors += 1
+            # Client errors (unknown model, bad request) say nothing about the server
+            if isinstance(error, ollama.ResponseError) and 0 < error.status_code < 500:
+                return
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.eject_after:
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds * 2 ** endpoint.ejections
+                endpoint.ejections += 1
+                endpoint.consecutive_failures = self.eject_after - 1
+    
+    async def request(self, method, model, **kwargs):
+        """Run AsyncClient.<method> on a picked endpoint."""
+        return await self.send(self.pick(model), method, model, **kwargs)
+    
+    async def send(self, endpoint, method, model, **kwargs):
+        """Run AsyncClient.<method> on an endpoint returned by pick() and release it."""
+        start = time.perf_counter()
+        try:
+            response = await getattr(get_async_client(endpoint.host), method)(model=model, **kwargs)
+        except asyncio.CancelledError:
+            self.release(endpoint)
+            raise
+        except Exception as e:
+            self.release(endpoint, error=e)
+            raise
+        self.release(endpoint, time.perf_counter() - start)
+        return response
+    
+    async def generate(self, model, prompt, **kwargs):
+        return await self.request("generate", model, prompt=prompt, **kwargs)
+    
+    async def chat(self, model, messages, **kwargs):
+        return await self.request("chat", model, messages=messages, **kwargs)
+    
+    def sync_client(self):
+        """Blocking generate/chat over the same endpoints, for threaded callers."""
+        return SyncLoadBalancer(self)
+    
+    def stats(self):
+        """Per-endpoint requests, errors, load, health and p50/p95 latency."""
+        now = time.monotonic()
+        with self._lock:
+            return {endpoint.host: endpoint.stats(now) for endpoint in self.endpoints}
+
+class SyncLoadBalancer:
+    """ollama.Client-style view of a LoadBalancer for synchronous code."""
+    
+    def __init__(self, balancer):
+        self.balancer = balancer
+    
+    def request(self, method, model, **kwargs):
+        endpoint = self.balancer.pick(model)
+        start = time.perf_counter()
+        try:
+            response = getattr(endpoint.sync_client(), method)(model=model, **kwargs)
+        except Exception as e:
+            self.balancer.release(endpoint, error=e)
+            raise
+        self.balancer.release(endpoint, time.perf_counter() - start)
+        return response
+    
+    def generate(self, model, prompt, **kwargs):
+        return self.request("generate", model, prompt=prompt, **kwargs)
+    
+    def chat(self, model, messages, **kwargs):
+        return self.request("chat", model, messages=messages, **kwargs)
+
+def _load(endpoint):
+    median = endpoint.percentile(0.5)
+    return (endpoint.in_flight, median if median is not None else 0.0)
+
+def _rendezvous(model, host):
+    """Highest-random-weight score; adding a host only moves the models it wins."""
+    return hashlib.sha1(f"{model}@{host}".encode()).digest()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Async Processing Benchmark - AsyncClient versus the thread-executor fallback.
+
+By default requests go to a local stub server with a fixed 200 ms latency, which
+isolates client-side concurrency. Pass --ollama to use the real OLLAMA_HOST.
+"""
+import asyncio
+import os
+import sys
+import time
+from stub_server import StubOllamaServer
+
+CONCURRENCY_LEVELS = [8, 64, 512]
+MODEL = "llama3"
+
+def main():
+    print("=== Async Processing Benchmark ===\n")
+    server = None
+    if "--ollama" not in sys.argv:
+        server = StubOllamaServer(delay=0.2)
+        # Must be set before ollama is imported so the module-level client uses it
+        os.environ["OLLAMA_HOST"] = server.start()
+        print(f"Stub server at {server.url} (200 ms per request)\n")
+    
+    from app import process_batch
+    from limiter import AdaptiveLimiter
+    
+    print(f"{'prompts':>8} {'AsyncClient':>12} {'threads':>12} {'speedup':>8}")
+    for count in CONCURRENCY_LEVELS:
+        prompts = [f"Say the number {i}" for i in range(count)]
+        timings = {}
+        peak = ""
+        for use_threads in (False, True):
+            if server:
+                server.peak_in_flight = 0
+            start = time.perf_counter()
+            # Pool and a fixed limiter sized to the level under test, so all `count`
+            # requests run at once and no AIMD ramp-up skews the comparison
+            limiter = AdaptiveLimiter(initial=count, min_limit=count, max_limit=count)
+            results = asyncio.run(process_batch(prompts, MODEL, use_threads=use_threads,
+                                                limiter=limiter, max_connections=count))
+            timings[use_threads] = time.perf_counter() - start
+            errors = sum(1 for r in results if r.startswith("Error:"))
+            if errors:
+                print(f"  {errors} errors ({'threads' if use_threads else 'AsyncClient'})")
+            if server and not use_threads:
+                peak = f" (AsyncClient peak {server.peak_in_flight} in flight)"
+        print(f"{count:>8} {timings[False]:>11.2f}s {timings[True]:>11.2f}s "
+              f"{timings[True] / timings[False]:>7.1f}x{peak}")
+    
+    if server:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
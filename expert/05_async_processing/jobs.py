@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Job Runner - Resumable JSONL batch jobs with compact checkpoints."""
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from app import stream_batch
+
+class Checkpoint:
+    """Which input lines are finished, stored as a watermark plus a sparse set.
+    
+    Every line before `watermark` is done or failed, `input_offset` is the
+    byte offset of that line, and `done` lists finished lines past the
+    watermark. `failed` maps failed lines (on either side of the watermark)
+    to their byte offsets; the watermark moves past them so one bad line
+    does not pin it, and a restart retries them from there. `output_bytes`
+    is the output size that matches this state; anything after it was
+    written by an interrupted run and gets truncated.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.watermark = 0
+        self.input_offset = 0
+        self.output_bytes = 0
+        self.done = set()
+        self.failed = {}
+        self._lines = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            self.watermark = data['watermark']
+            self.input_offset = data['input_offset']
+            self.output_bytes = data['output_bytes']
+            self.done = set(data['done'])
+            self.failed = {int(position): offset for position, offset in data.get('failed', {}).items()}
+    
+    def seen(self, position, line_start, line_end):
+        """Remember where an input line is so the watermark can move past it."""
+        self._lines[position] = (line_start, line_end)
+        self._advance()
+    
+    def finish(self, position, ok=True):
+        """Mark a line done or failed and advance the watermark over the finished prefix.
+        
+        A retried failure may finish before the input scan reaches its line;
+        its offset is already in `failed`, so it is never looked up in _lines.
+        """
+        if ok:
+            self.failed.pop(position, None)
+        elif position not in self.failed:
+            self.failed[position] = self._lines[position][0]
+        if position >= self.watermark:
+            self.done.add(position)
+            self._advance()
+    
+    def _advance(self):
+        """Move the watermark over finished lines whose end offset is known."""
+        while self.watermark in self.done and self.watermark in self._lines:
+            self.done.remove(self.watermark)
+            self.input_offset = self._lines.pop(self.watermark)[1]
+            self.watermark += 1
+    
+    def save(self, output_bytes):
+        """Atomically write the checkpoint for an output of output_bytes."""
+        self.output_bytes = output_bytes
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'watermark': self.watermark, 'input_offset': self.input_offset,
+                       'output_bytes': output_bytes, 'done': sorted(self.done),
+                       'failed': {str(position): offset for position, offset in sorted(self.failed.items())}}, f)
+        os.replace(tmp_path, self.path)
+
+async def run_job(input_path, output_path, checkpoint_path=None, model="llama3",
+                  prompt_field="prompt", id_field="id", window=64, checkpoint_every=100,
+                  client=None, limiter=None):
+    """Answer every prompt of a JSONL file, appending results to output_path.
+    
+    Results are written as they complete and checkpointed every
+    checkpoint_every results. A restarted job seeks straight to the first
+    unfinished input line, skips finished ones and never reads the output.
+    Failed prompts are recorded in the checkpoint and retried on restart.
+    client and limiter are passed to stream_batch, e.g. a LoadBalancer or a
+    RequestScheduler's bulk limiter.
+    """
+    checkpoint = Checkpoint(checkpoint_path or output_path + '.checkpoint')
+    stats = {'completed': 0, 'failed': 0, 'skipped': 0}
+    start = time.perf_counter()
+    
+    # Drop results written after the last checkpoint; they will be redone
+    mode = 'r+b' if os.path.exists(output_path) else 'w+b'
+    output = open(output_path, mode)
+    output.truncate(checkpoint.output_bytes)
+    output.seek(checkpoint.output_bytes)
+    
+    records = {}
+    started = itertools.count()
+    
+    def prompts():
+        """Stream unfinished prompts, recording each line's position and id."""
+        
+        def queue(position, line):
+            record = json.loads(line)
+            records[next(started)] = (position, record.get(id_field, position))
+            return record[prompt_field]
+        
+        with open(input_path, 'rb') as f:
+            # Earlier failures first, read straight from their offsets
+            for position, offset in sorted(checkpoint.failed.items()):
+                f.seek(offset)
+                yield queue(position, f.readline())
+            f.seek(checkpoint.input_offset)
+            position = checkpoint.watermark
+            line_start = checkpoint.input_offset
+            for line in f:
+                line_end = line_start + len(line)
+                # Check before seen(), which may move the watermark past this line
+                finished = position in checkpoint.done
+                checkpoint.seen(position, line_start, line_end)
+                if finished:
+                    stats['skipped'] += 1
+                elif not line.strip():
+                    checkpoint.finish(position)
+                else:
+                    yield queue(position, line)
+                position += 1
+                line_start = line_end
+    
+    since_checkpoint = 0
+    try:
+        async for index, prompt, result in stream_batch(prompts(), model, mode="as_completed", window=window,
+                                                         client=client, limiter=limiter):
+            position, record_id = records.pop(index)
+            if result.startswith("Error:"):
+                checkpoint.finish(position, ok=False)
+                stats['failed'] += 1
+            else:
+                output.write((json.dumps({'id': record_id, 'prompt': prompt, 'response': result}) + "\n").encode())
+                checkpoint.finish(position)
+                stats['completed'] += 1
+            since_checkpoint += 1
+            if since_checkpoint >= checkpoint_every:
+                _commit(output, checkpoint)
+                since_checkpoint = 0
+    finally:
+        _commit(output, checkpoint)
+        output.close()
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+def _commit(output, checkpoint):
+    """Make written results durable, then record them in the checkpoint."""
+    output.flush()
+    os.fsync(output.fileno())
+    checkpoint.save(output.tell())
+
+def main():
+    print("=== JSONL Job Runner ===\n")
+    if len(sys.argv) < 3:
+        print("Usage: python jobs.py input.jsonl output.jsonl [model]")
+        return
+    model = sys.argv[3] if len(sys.argv) > 3 else "llama3"
+    stats = asyncio.run(run_job(sys.argv[1], sys.argv[2], model=model))
+    print(f"Completed: {stats['completed']}, failed: {stats['failed']}, "
+          f"already done: {stats['skipped']}, time: {stats['seconds']:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Adaptive Limiter - AIMD concurrency control driven by latency and errors."""
+import asyncio
+import contextlib
+import time
+
+class AdaptiveLimiter:
+    """Adjusts how many requests may be in flight at once.
+    
+    Additive increase: every success under the latency threshold grows the
+    limit by 1/limit, i.e. about +1 per round of `limit` requests.
+    Multiplicative decrease: an error, or a smoothed latency above
+    latency_tolerance x the no-load baseline (requests queueing on the
+    server), scales the limit by `backoff` - at most once per observed latency.
+    The baseline is the lowest latency seen, drifting up by baseline_drift per
+    request so it follows a workload whose prompts get longer.
+    """
+    
+    def __init__(self, initial=4, min_limit=1, max_limit=64, backoff=0.5,
+                 latency_tolerance=1.5, smoothing=0.2, baseline_drift=0.01):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.baseline_drift = baseline_drift
+        self.in_flight = 0
+        self.completed = 0
+        self.errors = 0
+        self.error_rate = 0.0
+        self.latency = None
+        self.baseline = None
+        self.peak_limit = self.limit
+        self._last_decrease = 0.0
+        self._condition = None
+    
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Hold one in-flight slot; exceptions inside count as errors."""
+        await self.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        except asyncio.CancelledError:
+            await self.release(None, error=False)
+            raise
+        except Exception:
+            await self.release(time.perf_counter() - start, error=True)
+            raise
+        await self.release(time.perf_counter() - start, error=False)
+    
+    async def acquire(self):
+        """Wait until fewer than `limit` requests are in flight."""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+    
+    async def release(self, latency, error=False):
+        """Record the outcome of a request and adjust the limit."""
+        async with self._condition:
+            self.in_flight -= 1
+            if latency is not None:
+                self._observe(latency, error)
+            self._condition.notify_all()
+    
+    def _observe(self, latency, error):
+        """Update latency/error averages and apply AIMD."""
+        self.completed += 1
+        self.errors += int(error)
+        self.error_rate += self.smoothing * (int(error) - self.error_rate)
+        if error:
+            self._decrease()
+            return
+        if self.latency is None:
+            self.latency = self.baseline = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+            self.baseline = min(self.baseline * (1 + self.baseline_drift), latency)
+        if self.latency > self.latency_tolerance * self.baseline:
+            self._decrease()
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.peak_limit = max(self.peak_limit, self.limit)
+    
+    def _decrease(self):
+        """Back off, but only once per latency period so one burst counts once."""
+        now = time.perf_counter()
+        if now - self._last_decrease < (self.latency or 0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+    
+    def metrics(self):
+        """Current limit and observed latency/error statistics."""
+        return {
+            'limit': int(self.limit),
+            'peak_limit': int(self.peak_limit),
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'errors': self.errors,
+            'error_rate': self.error_rate,
+            'latency_ms': self.latency * 1000 if self.latency is not None else None,
+            'baseline_latency_ms': self.baseline * 1000 if self.baseline is not None else None
+        }
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Request Policy - Retries with jittered backoff, deadlines and hedged requests."""
+import asyncio
+import collections
+import random
+import time
+import httpx
+import ollama
+from app import get_async_client
+
+RETRYABLE_STATUS = (408, 429)
+
+def is_retryable(error):
+    """Transport failures, timeouts, overload and 5xx answers are worth retrying."""
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return isinstance(error, (ConnectionError, httpx.TransportError, asyncio.TimeoutError))
+
+class RequestPolicy:
+    """Wraps generate/chat calls with retries, a deadline and optional hedging.
+    
+    Retryable failures are retried up to max_retries times after a "full
+    jitter" backoff: a random wait in [0, min(max_delay, base_delay * 2**n)].
+    `deadline` (seconds, overridable per call) bounds the whole request
+    including retries; no retry is started that could not finish in time.
+    
+    With hedge=True, a request still unanswered after the hedge_quantile
+    latency of recent requests is sent again - to a different endpoint when
+    a LoadBalancer is given - and the first answer wins; the other is
+    cancelled. Until hedge_min_samples latencies are known, no hedges are sent.
+    
+    generate/chat match ollama.AsyncClient, so a policy can be passed as
+    `client` to process_batch, stream_batch or run_job.
+    """
+    
+    def __init__(self, balancer=None, client=None, max_retries=3, base_delay=0.1, max_delay=5.0,
+                 deadline=None, hedge=False, hedge_quantile=0.95, hedge_min_samples=20, window=512):
+        self.balancer = balancer
+        self.client = client
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies = collections.deque(maxlen=window)
+        self.counts = collections.Counter()
+    
+    async def generate(self, model, prompt, deadline=None, **kwargs):
+        return await self.request("generate", model, deadline, prompt=prompt, **kwargs)
+    
+    async def chat(self, model, messages, deadline=None, **kwargs):
+        return await self.request("chat", model, deadline, messages=messages, **kwargs)
+    
+    async def request(self, method, model, deadline=None, **kwargs):
+        """Run one logical request; raises asyncio.TimeoutError past the deadline."""
+        deadline = deadline if deadline is not None else self.deadline
+        self.counts['requests'] += 1
+        try:
+            if deadline is None:
+                return await self._with_retries(method, model, None, kwargs)
+            expires = time.perf_counter() + deadline
+            return await asyncio.wait_for(self._with_retries(method, model, expires, kwargs), deadline)
+        except asyncio.TimeoutError:
+            self.counts['deadline_exceeded'] += 1
+            raise
+        except Exception:
+            self.counts['failures'] += 1
+            raise
+    
+    async def _with_retries(self, method, model, expires, kwargs):
+        attempt = 0
+        while True:
+            try:
+                return await self._hedged(method, model, kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if expires is not None and time.perf_counter() + delay >= expires:
+                    raise
+                attempt += 1
+                self.counts['retries'] += 1
+                await asyncio.sleep(delay)
+    
+    def call_sync(self, fn, *args, **kwargs):
+        """Retry a blocking call such as ollama.generate with the same backoff.
+        
+        The deadline is checked between attempts only; a blocking call in
+        progress cannot be interrupted, and there is no hedging.
+        """
+        expires = time.perf_counter() + self.deadline if self.deadline is not None else None
+        self.counts['requests'] += 1
+        attempt = 0
+        while True:
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if attempt >= self.max_retries or not is_retryable(e) or (
+                        expires is not None and time.perf_counter() + delay >= expires):
+                    self.counts['failures'] += 1
+                    raise
+                attempt += 1
+                self.counts['retries'] += 1
+                time.sleep(delay)
+    
+    async def _hedged(self, method, model, kwargs):
+        """Send the request, and a hedge if it outlives the hedge delay."""
+        delay = self.hedge_delay()
+        primary_endpoint = self._pick(model)
+        primary = asyncio.ensure_future(self._attempt(primary_endpoint, method, model, kwargs))
+        pending = {primary}
+        try:
+            if delay is None:
+                return await primary
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+            self.counts['hedges'] += 1
+            exclude = (primary_endpoint,) if primary_endpoint is not None else ()
+            hedge = asyncio.ensure_future(self._attempt(self._pick(model, exclude), method, model, kwargs))
+            pending.add(hedge)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.counts['hedges_won'] += 1
+                        return task.result()
+            # Both failed: surface the primary's error
+            return primary.result()
+        finally:
+            # Also runs when the deadline cancels us mid-wait
+            for task in pending:
+                task.cancel()
+    
+    def _pick(self, model, exclude=()):
+        return self.balancer.pick(model, exclude) if self.balancer is not None else None
+    
+    async def _attempt(self, endpoint, method, model, kwargs):
+        start = time.perf_counter()
+        if endpoint is not None:
+            response = await self.balancer.send(endpoint, method, model, **kwargs)
+        else:
+            response = await getattr(self.client or get_async_client(), method)(model=model, **kwargs)
+        self.latencies.append(time.perf_counter() - start)
+        return response
+    
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None when hedging is off or unprimed."""
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))]
+    
+    def stats(self):
+        """Requests, retries, failures, deadlines missed, hedges sent and won."""
+        delay = self.hedge_delay()
+        return {
+            'requests': self.counts['requests'],
+            'retries': self.counts['retries'],
+            'failures': self.counts['failures'],
+            'deadline_exceeded': self.counts['deadline_exceeded'],
+            'hedges': self.counts['hedges'],
+            'hedges_won': self.counts['hedges_won'],
+            'hedge_delay_ms': delay * 1000 if delay is not None else None,
+        }
+
+async def _run(hosts, hedge, requests=400, concurrency=16):
+    from balancer import LoadBalancer
+    policy = RequestPolicy(LoadBalancer(hosts), hedge=hedge, deadline=10.0)
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+    
+    async def one(i):
+        async with slots:
+            start = time.perf_counter()
+            await policy.generate(model="llama3", prompt=f"Prompt {i}")
+            latencies.append(time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    latencies.sort()
+    return time.perf_counter() - start, latencies[int(0.99 * len(latencies))], policy.stats()
+
+def main():
+    print("=== Request Policy Demo ===\n")
+    from stub_server import StubOllamaServer
+    # 3% of requests hit a 1 s stall, 5% fail with HTTP 500
+    servers = [StubOllamaServer(delay=0.05, slow_rate=0.03, slow_delay=1.0, fail_rate=0.05) for _ in range(2)]
+    hosts = [server.start() for server in servers]
+    try:
+        for hedge in (False, True):
+            elapsed, p99, stats = asyncio.run(_run(hosts, hedge))
+            print(f"hedge={hedge}: {elapsed:.2f}s, p99 {p99 * 1000:.0f} ms, {stats['retries']} retries, "
+                  f"{stats['hedges_won']}/{stats['hedges']} hedges won")
+    finally:
+        for server in servers:
+            server.stop()
+
+if __name__ == "__main__":
+    main()
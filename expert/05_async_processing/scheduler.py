@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Request Scheduler - Priority classes and weighted fair queuing per tenant."""
+import asyncio
+import collections
+import contextlib
+import heapq
+import itertools
+import threading
+import time
+
+DEFAULT_PRIORITIES = {"interactive": 0, "bulk": 1}
+
+class _Waiter:
+    """A queued request, woken by a future (async callers) or an event (threads)."""
+    
+    def __init__(self, request_class, tenant, loop=None):
+        self.request_class = request_class
+        self.tenant = tenant
+        self.enqueued = time.perf_counter()
+        self.granted = False
+        if loop is None:
+            self._event = threading.Event()
+        else:
+            self._loop = loop
+            self._future = loop.create_future()
+            self._event = None
+    
+    def wake(self):
+        if self._event is not None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(_resolve, self._future)
+    
+    def wait_sync(self):
+        self._event.wait()
+    
+    def wait_async(self):
+        return self._future
+
+class ClassStats:
+    """Admission, wait time and throughput counters for one request class."""
+    
+    def __init__(self, window=1024):
+        self.queued = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.completed = 0
+        self.waits = collections.deque(maxlen=window)
+
+class RequestScheduler:
+    """Admits requests to a shared Ollama server by priority, then by fair share.
+    
+    Each request names a class and a tenant. A lower priority number always
+    goes first: a queued interactive request is admitted before any queued
+    bulk one, and `reserved` keeps slots that lower classes may not use, so
+    an interactive request arriving during a bulk job finds a free slot
+    instead of waiting for a bulk request to finish. Within a class, tenants
+    share admissions by weighted fair queuing (start-time virtual clock).
+    
+    Usable from asyncio (`slot`, or `limiter()` for process_batch) and from
+    threads (`hold`), so a synchronous chatbot and async bulk jobs in one
+    process share the same capacity.
+    """
+    
+    def __init__(self, capacity=4, priorities=None, reserved=None, weights=None):
+        self.capacity = capacity
+        self.priorities = dict(priorities or DEFAULT_PRIORITIES)
+        self.weights = dict(weights or {})
+        self.in_flight = 0
+        self.stats = {name: ClassStats() for name in self.priorities}
+        self._order = sorted(self.priorities, key=self.priorities.get)
+        reserved = dict(reserved if reserved is not None else {self._order[0]: 1})
+        # A class may fill the capacity minus what higher classes reserve
+        self._limits = {}
+        held_back = 0
+        for name in self._order:
+            self._limits[name] = max(1, capacity - held_back)
+            held_back += reserved.get(name, 0)
+        self._queues = {name: [] for name in self.priorities}
+        self._virtual_time = {name: 0.0 for name in self.priorities}
+        self._finish_tags = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+    
+    @contextlib.asynccontextmanager
+    async def slot(self, request_class="bulk", tenant="default", cost=1.0):
+        """Hold one admission slot for an async request."""
+        await self.acquire(request_class, tenant, cost)
+        try:
+            yield
+        finally:
+            self.release(request_class)
+    
+    @contextlib.contextmanager
+    def hold(self, request_class="interactive", tenant="default", cost=1.0):
+        """Hold one admission slot for a blocking request."""
+        waiter = self._enqueue(request_class, tenant, cost, loop=None)
+        if waiter is not None:
+            waiter.wait_sync()
+        try:
+            yield
+        finally:
+            self.release(request_class)
+    
+    async def acquire(self, request_class="bulk", tenant="default", cost=1.0):
+        """Wait for admission; a cancelled waiter gives its slot back."""
+        waiter = self._enqueue(request_class, tenant, cost, loop=asyncio.get_running_loop())
+        if waiter is None:
+            return
+        try:
+            await waiter.wait_async()
+        except asyncio.CancelledError:
+            with self._lock:
+                if not waiter.granted:
+                    self._remove(waiter)
+                    raise
+            self.release(request_class)
+            raise
+    
+    def release(self, request_class):
+        """Return a slot and admit whoever is next."""
+        with self._lock:
+            self.in_flight -= 1
+            stats = self.stats[request_class]
+            stats.in_flight -= 1
+            stats.completed += 1
+            self._dispatch()
+    
+    def limiter(self, request_class="bulk", tenant="default"):
+        """An AdaptiveLimiter-style view to pass as `limiter` to process_batch."""
+        return ClassLimiter(self, request_class, tenant)
+    
+    def metrics(self):
+        """Per class: queue length, in flight, throughput and queue wait."""
+        with self._lock:
+            elapsed = time.perf_counter() - self._started
+            result = {}
+            for name in self._order:
+                stats = self.stats[name]
+                waits = sorted(stats.waits)
+                result[name] = {
+                    'queued': stats.queued,
+                    'in_flight': stats.in_flight,
+                    'admitted': stats.admitted,
+                    'completed': stats.completed,
+                    'throughput_per_sec': stats.completed / elapsed if elapsed else 0.0,
+                    'mean_wait_ms': sum(waits) / len(waits) * 1000 if waits else None,
+                    'p95_wait_ms': waits[min(len(waits) - 1, int(0.95 * len(waits)))] * 1000 if waits else None,
+                }
+            return result
+    
+    def _enqueue(self, request_class, tenant, cost, loop):
+        """Admit at once if allowed (returns None), else queue and return the waiter."""
+        if request_class not in self.priorities:
+            raise ValueError(f"Unknown request class: {request_class}")
+        with self._lock:
+            waiter = _Waiter(request_class, tenant, loop)
+            if self.in_flight < self._limits[request_class] and not self._waiting_ahead(request_class):
+                self._admit(waiter)
+                return None
+            start = max(self._virtual_time[request_class], self._finish_tags.get((request_class, tenant), 0.0))
+            finish = start + cost / self.weights.get(tenant, 1.0)
+            self._finish_tags[(request_class, tenant)] = finish
+            heapq.heappush(self._queues[request_class], (finish, next(self._sequence), waiter))
+            self.stats[request_class].queued += 1
+            return waiter
+    
+    def _waiting_ahead(self, request_class):
+        """Whether this or a higher-priority class already has queued requests."""
+        priority = self.priorities[request_class]
+        return any(self._queues[name] for name in self._order if self.priorities[name] <= priority)
+    
+    def _dispatch(self):
+        """Admit queued requests in priority order while their class has room."""
+        for name in self._order:
+            queue = self._queues[name]
+            while queue and self.in_flight < self._limits[name]:
+                finish, _, waiter = heapq.heappop(queue)
+                self._virtual_time[name] = finish
+                self.stats[name].queued -= 1
+                self._admit(waiter)
+                waiter.wake()
+            if queue:
+                # Lower classes never jump a higher class that is still waiting
+                return
+    
+    def _admit(self, waiter):
+        waiter.granted = True
+        self.in_flight += 1
+        stats = self.stats[waiter.request_class]
+        stats.in_flight += 1
+        stats.admitted += 1
+        stats.waits.append(time.perf_counter() - waiter.enqueued)
+    
+    def _remove(self, waiter):
+        queue = self._queues[waiter.request_class]
+        queue[:] = [entry for entry in queue if entry[2] is not waiter]
+        heapq.heapify(queue)
+        self.stats[waiter.request_class].queued -= 1
+        self._dispatch()
+
+class ClassLimiter:
+    """Admits through a RequestScheduler under a fixed class and tenant."""
+    
+    def __init__(self, scheduler, request_class, tenant):
+        self.scheduler = scheduler
+        self.request_class = request_class
+        self.tenant = tenant
+    
+    def slot(self):
+        return self.scheduler.slot(self.request_class, self.tenant)
+    
+    def metrics(self):
+        return self.scheduler.metrics()[self.request_class]
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+async def _demo(url):
+    import ollama
+    from app import process_batch
+    scheduler = RequestScheduler(capacity=4)
+    client = ollama.AsyncClient(host=url)
+    bulk = asyncio.ensure_future(process_batch([f"Bulk prompt {i}" for i in range(200)],
+                                               client=client, limiter=scheduler.limiter("bulk", "nightly")))
+    for i in range(10):
+        await asyncio.sleep(0.2)
+        async with scheduler.slot("interactive", tenant=f"user-{i % 3}"):
+            await client.chat(model="llama3", messages=[{'role': 'user', 'content': "Hello"}])
+    await bulk
+    return scheduler.metrics()
+
+def main():
+    print("=== Request Scheduler Demo ===\n")
+    from stub_server import StubOllamaServer
+    server = StubOllamaServer(delay=0.05, capacity=4)
+    try:
+        metrics = asyncio.run(_demo(server.start()))
+    finally:
+        server.stop()
+    for name, stats in metrics.items():
+        print(f"{name}: {stats['completed']} done, {stats['throughput_per_sec']:.1f}/s, "
+              f"wait mean {stats['mean_wait_ms']:.1f} ms, p95 {stats['p95_wait_ms']:.1f} ms")
+
+if __name__ == "__main__":
+    main()
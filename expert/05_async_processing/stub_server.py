@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Stub Ollama Server - Minimal /api/generate and /api/chat stand-in for benchmarks."""
+import asyncio
+import json
+import random
+import threading
+
+class StubOllamaServer:
+    """HTTP/1.1 keep-alive server answering after a fixed delay, in a background thread.
+    
+    With `capacity` set, only that many requests are processed at once (like
+    OLLAMA_NUM_PARALLEL) and the rest queue; `fail_rate` makes that share of
+    requests answer HTTP 500, and `slow_rate` that share take `slow_delay`
+    longer (a latency tail).
+    """
+    
+    def __init__(self, delay=0.2, host="127.0.0.1", port=0, capacity=None, fail_rate=0.0,
+                 slow_rate=0.0, slow_delay=1.0):
+        self.delay = delay
+        self.capacity = capacity
+        self.fail_rate = fail_rate
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._loop = None
+        self._server = None
+        self._slots = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    @property
+    def url(self):
+        """Base URL to use as OLLAMA_HOST."""
+        return f"http://{self.host}:{self.port}"
+    
+    def start(self):
+        """Start serving and return the base URL."""
+        self._thread.start()
+        self._ready.wait()
+        return self.url
+    
+    def stop(self):
+        """Close open connections and stop the server thread."""
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+    
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, backlog=4096))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+    
+    async def _shutdown(self):
+        self._server.close()
+        handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+    
+    async def _handle(self, reader, writer):
+        """Serve keep-alive requests on one connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                path = request_line.split()[1].decode()
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                body = json.loads(await reader.readexactly(length)) if length else {}
+                status, payload = await self._respond(path, body)
+                data = json.dumps(payload).encode()
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n".encode()
+                             + f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _respond(self, path, body):
+        """Wait the configured delay and build an Ollama-shaped response."""
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        delay = self.delay
+        if self.slow_rate and random.random() < self.slow_rate:
+            delay += self.slow_delay
+        try:
+            if self.capacity:
+                if self._slots is None:
+                    self._slots = asyncio.Semaphore(self.capacity)
+                async with self._slots:
+                    await asyncio.sleep(delay)
+            else:
+                await asyncio.sleep(delay)
+        finally:
+            self.in_flight -= 1
+        if self.fail_rate and random.random() < self.fail_rate:
+            return "500 Internal Server Error", {"error": "stub failure"}
+        model = body.get("model", "stub")
+        stats = {"done": True, "eval_count": 8, "eval_duration": int(self.delay * 1e9),
+                 "prompt_eval_count": 4, "load_duration": 0}
+        if path == "/api/chat":
+            return "200 OK", {"model": model, "message": {"role": "assistant", "content": "stub answer"}, **stats}
+        return "200 OK", {"model": model, "response": "stub answer", **stats}